@@ -1,7 +1,7 @@
 from url_manager import ImageURLManager
-from flask import Flask, request, jsonify, send_file, make_response
+from flask import Flask, request, jsonify, send_file, make_response, copy_current_request_context, g, Response
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -10,16 +10,29 @@ from werkzeug.utils import secure_filename
 from firebase_auth import firebase_required, get_firebase_user
 import os
 import uuid
+import time
+import queue
+import hashlib
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from PIL import Image
 import io
 from dotenv import load_dotenv
 from validators import validate_email, validate_username, validate_password, validate_note_title, validate_note_description, validate_tags, validate_file_upload, sanitize_search_query
 from s3_service import s3_service
+from search_index import SearchIndex
+from local_cache import LocalCache, InvalidationListener
+from redis_scripts import if_loaded
+from counter_buffer import CounterBuffer
+from engagement import EngagementStream
+from notification_queue import NotificationDispatcher
+from notification_stream import NotificationHub
+from follow_graph import FollowGraph
+from timelines import TimelineStore, timeline_score
 import redis
 from functools import wraps
 import json
+from sqlalchemy.exc import IntegrityError
 # Image Preview System
 import sqlite3
 from datetime import datetime
@@ -677,6 +690,7 @@ logger = logging.getLogger(__name__)
 
 try:
     from tasks import process_image_thumbnails, update_note_thumbnails, cleanup_old_files
+    from tasks import deliver_notifications as deliver_notifications_task
     CELERY_AVAILABLE = True
 except ImportError:
     CELERY_AVAILABLE = False
@@ -740,8 +754,38 @@ except:
     redis_client = None
     logger.warning("Redis not available, caching disabled")
 
+# First cache tier: per-worker memory in front of Redis, kept coherent via pub/sub
+local_cache = LocalCache(
+    max_bytes=int(os.getenv('LOCAL_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    default_ttl=int(os.getenv('LOCAL_CACHE_TTL', 60))
+)
+cache_invalidation = InvalidationListener(redis_client, local_cache) if redis_client else None
+
+# View/download increments are buffered and flushed to the note table in batches
+counter_buffer = CounterBuffer(redis_client)
+COUNTER_FLUSH_INTERVAL = int(os.getenv('COUNTER_FLUSH_INTERVAL', 30))
+
+# Raw engagement events, compacted into EngagementRollup buckets for creator analytics
+engagement_stream = EngagementStream(redis_client)
+ENGAGEMENT_COMPACT_INTERVAL = int(os.getenv('ENGAGEMENT_COMPACT_INTERVAL', 60))
+# A run drains the stream for up to this long; the lock outlives a slow batch by a wide margin
+ENGAGEMENT_COMPACT_BUDGET = int(os.getenv('ENGAGEMENT_COMPACT_BUDGET', 45))
+ENGAGEMENT_COMPACT_LOCK_TIMEOUT = ENGAGEMENT_COMPACT_BUDGET + 60
+
+# Notification events are coalesced per recipient and written outside the request
+NOTIFICATION_BATCH_WINDOW = float(os.getenv('NOTIFICATION_BATCH_WINDOW', 1.0))
+# Hand notification batches to Celery only when a worker is deployed; otherwise they'd sit in the broker
+NOTIFICATIONS_VIA_CELERY = os.getenv('NOTIFICATIONS_VIA_CELERY', 'false').lower() == 'true'
+
+# Live notification events for /api/notifications/stream, fanned out across workers via pub/sub
+notification_hub = NotificationHub(redis_client)
+SSE_HEARTBEAT_INTERVAL = int(os.getenv('SSE_HEARTBEAT_INTERVAL', 15))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 5000))
+SSE_REPLAY_LIMIT = 50
+
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
+search_index = SearchIndex(db)
 
 # Association table for user followers/following relationship
 follows = db.Table('follows',
@@ -749,6 +793,20 @@ follows = db.Table('follows',
     db.Column('followed_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
 )
 
+# Redis mirror of `follows` for O(1) follow checks
+follow_graph = FollowGraph(db, follows, redis_client)
+
+# Fan-out-on-write following feeds; authors above the follower limit are merged in at read time
+timelines = TimelineStore(redis_client, max_length=int(os.getenv('TIMELINE_MAX_LENGTH', 800)))
+FEED_FANOUT_FOLLOWER_LIMIT = int(os.getenv('FEED_FANOUT_FOLLOWER_LIMIT', 5000))
+
+# Association table for normalized note tags; the (tag_id, note_id) index serves tag filters
+note_tags = db.Table('note_tags',
+    db.Column('note_id', db.Integer, db.ForeignKey('note.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_note_tags_tag_note', 'tag_id', 'note_id')
+)
+
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'thumbnails'), exist_ok=True)
 
@@ -848,35 +906,187 @@ def get_shareable_url(note_id):
         logger.error(f"Error getting shareable URL for note {note_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-def cache_result(key_prefix, timeout=300):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            if not redis_client:
-                return f(*args, **kwargs)
+def make_cache_key(key_prefix, view_args):
+    """
+    Build a cache key that is stable across processes and distinct for every
+    request variant: endpoint, URL arguments and sorted query string.
+    Responses are shared by all callers, so only cache views that don't
+    depend on who is asking.
+    """
+    variant = {
+        'endpoint': request.endpoint,
+        'view_args': view_args,
+        'query': sorted(request.args.items(multi=True))
+    }
+    digest = hashlib.blake2b(json.dumps(variant, sort_keys=True, default=str).encode(), digest_size=16)
+    return f"{key_prefix}:{digest.hexdigest()}"
+
+def purge_cache(*surrogate_keys):
+    """
+    Evict every cached response tagged with any of the given surrogate keys,
+    e.g. purge_cache('feed', 'note:12', 'user:3', 'tag:math')
+    """
+    if not redis_client or not surrogate_keys:
+        return
+
+    try:
+        index_keys = [f"surrogate:{key}" for key in surrogate_keys]
+        pipe = redis_client.pipeline()
+        for index_key in index_keys:
+            pipe.smembers(index_key)
+        cache_keys = set().union(*pipe.execute())
+        redis_client.delete(*cache_keys, *index_keys)
+        if cache_keys:
+            cache_invalidation.publish(cache_keys)
+        logger.debug(f"Purged {len(cache_keys)} cached responses for {surrogate_keys}")
+    except Exception as e:
+        logger.warning(f"Cache purge error: {e}")
 
-            cache_key = f"{key_prefix}:{hash(str(args) + str(sorted(kwargs.items())))}"
+CACHE_LOCK_TIMEOUT = 10  # Seconds one worker may spend recomputing a cache entry
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+def cache_result(key_prefix, timeout=300, surrogate_keys=None, stale_while_revalidate=0):
+    """
+    Cache a view's dict result in the local tier and Redis.
+
+    `surrogate_keys` is a list of keys, or a function of the result returning
+    one, that tags the cached entry so purge_cache can evict it on writes.
+
+    When an entry expires only one worker recomputes it, holding a short
+    Redis lock, while the others wait for its result. With
+    `stale_while_revalidate` seconds, an expired entry is kept that much
+    longer and served while the lock holder refreshes it in the background.
+    """
+    def decorator(f):
+        def read(cache_key):
+            """Returns (value, is_fresh), or (None, False) on a miss"""
+            value = local_cache.get(cache_key)
+            if value is not None:
+                return value, True
 
             try:
                 cached = redis_client.get(cache_key)
-                if cached:
-                    logger.debug(f"Cache hit for {cache_key}")
-                    return json.loads(cached)
             except Exception as e:
                 logger.warning(f"Cache read error: {e}")
+                return None, False
+            if not cached:
+                return None, False
 
-            result = f(*args, **kwargs)
+            entry = json.loads(cached)
+            fresh_for = entry.get('fresh_until', 0) - time.time()
+            if fresh_for > 0:
+                local_cache.set(cache_key, entry['value'], len(cached), fresh_for)
+            return entry['value'], fresh_for > 0
+
+        def store(cache_key, result):
+            tags = surrogate_keys(result) if callable(surrogate_keys) else (surrogate_keys or [])
+            payload = json.dumps({'value': result, 'fresh_until': time.time() + timeout}, default=str)
 
             try:
-                redis_client.setex(cache_key, timeout, json.dumps(result, default=str))
+                pipe = redis_client.pipeline()
+                pipe.setex(cache_key, timeout + stale_while_revalidate, payload)
+                for tag in set(tags):
+                    pipe.sadd(f"surrogate:{tag}", cache_key)
+                    pipe.expire(f"surrogate:{tag}", timeout + stale_while_revalidate)
+                pipe.execute()
+                local_cache.set(cache_key, json.loads(payload)['value'], len(payload), timeout)
                 logger.debug(f"Cached result for {cache_key}")
             except Exception as e:
                 logger.warning(f"Cache write error: {e}")
 
-            return result
+        def recompute(cache_key, lock_key, token, args, kwargs):
+            try:
+                result = f(*args, **kwargs)
+                if isinstance(result, dict):
+                    store(cache_key, result)
+                # Error responses are returned as (response, status) and never cached
+                return result
+            finally:
+                if token:
+                    release_lock(lock_key, token)
+
+        def wait_for(cache_key, lock_key):
+            """Wait for the lock holder to store a value; None if it gives up or times out"""
+            deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(CACHE_LOCK_POLL_INTERVAL)
+                value, _ = read(cache_key)
+                if value is not None:
+                    return value
+                try:
+                    if not redis_client.exists(lock_key):
+                        return None
+                except Exception:
+                    return None
+            return None
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not redis_client:
+                return f(*args, **kwargs)
+
+            cache_invalidation.ensure_started()
+            cache_key = make_cache_key(key_prefix, kwargs)
+
+            value, fresh = read(cache_key)
+            if fresh:
+                logger.debug(f"Cache hit for {cache_key}")
+                return value
+
+            lock_key = f"lock:{cache_key}"
+            token = acquire_lock(lock_key)
+
+            if value is not None:
+                # Stale hit: serve it, and let the lock holder refresh in the background
+                if token:
+                    refresh = copy_current_request_context(
+                        lambda: recompute(cache_key, lock_key, token, args, kwargs)
+                    )
+                    threading.Thread(target=refresh, daemon=True).start()
+                return value
+
+            if not token:
+                value = wait_for(cache_key, lock_key)
+                if value is not None:
+                    return value
+
+            return recompute(cache_key, lock_key, token, args, kwargs)
         return decorated_function
     return decorator
 
+def acquire_lock(lock_key, timeout=CACHE_LOCK_TIMEOUT):
+    """Try to take a short-lived Redis lock; returns its token, or None if someone else holds it"""
+    token = uuid.uuid4().hex
+    try:
+        if redis_client.set(lock_key, token, nx=True, ex=timeout):
+            return token
+    except Exception as e:
+        logger.warning(f"Cache lock error: {e}")
+    return None
+
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+def renew_lock(lock_key, token, timeout):
+    """Extend a lock we still hold; returns False if it expired and changed hands"""
+    try:
+        return bool(redis_client.eval(RENEW_LOCK_SCRIPT, 1, lock_key, token, timeout))
+    except Exception as e:
+        logger.warning(f"Lock renewal error: {e}")
+        return False
+
+def release_lock(lock_key, token):
+    """Release a lock taken by acquire_lock, unless it already expired and changed hands"""
+    try:
+        if redis_client.get(lock_key) == token:
+            redis_client.delete(lock_key)
+    except Exception as e:
+        logger.warning(f"Cache unlock error: {e}")
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     firebase_uid = db.Column(db.String(128), unique=True, nullable=True)  # Firebase UID
@@ -893,6 +1103,12 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Profile counters maintained by adjust_user_counters, see reconcile_user_counters
+    public_notes_count = db.Column(db.Integer, default=0)
+    total_notes_count = db.Column(db.Integer, default=0)
+    followers_count = db.Column(db.Integer, default=0)
+    following_count = db.Column(db.Integer, default=0)
+    notification_seq = db.Column(db.Integer, default=0)  # Last event sequence handed out, see next_notification_seqs
 
     notes = db.relationship('Note', backref='author', lazy=True, cascade='all, delete-orphan')
 
@@ -916,33 +1132,31 @@ class User(db.Model):
             'pronouns': self.pronouns,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'notes_count': len([note for note in self.notes if note.is_public]),
-            'followers_count': self.followers.count(),
-            'following_count': self.followed.count()
+            'notes_count': self.public_notes_count or 0,
+            'followers_count': self.followers_count or 0,
+            'following_count': self.following_count or 0
         }
 
         if include_private:
             data.update({
                 'email': self.email,
                 'is_active': self.is_active,
-                'total_notes_count': len(self.notes)
+                'total_notes_count': self.total_notes_count or 0
             })
 
         return data
 
-    def follow(self, user):
-        """Follow a user"""
-        if not self.is_following(user):
-            self.followed.append(user)
-
-    def unfollow(self, user):
-        """Unfollow a user"""
-        if self.is_following(user):
-            self.followed.remove(user)
+    def to_summary(self):
+        """Compact form embedded in other payloads; reads only columns already loaded"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'avatar_url': self.avatar_url
+        }
 
     def is_following(self, user):
         """Check if following a user"""
-        return self.followed.filter(follows.c.followed_id == user.id).count() > 0
+        return follow_graph.is_following(self.id, user.id)
 
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -963,12 +1177,22 @@ class Note(db.Model):
     expiry_date = db.Column(db.DateTime, nullable=True, index=True)
     views_count = db.Column(db.Integer, default=0)
     downloads_count = db.Column(db.Integer, default=0)
+    likes_count = db.Column(db.Integer, default=0)  # Maintained by toggle_like, see reconcile_note_counters
+    comments_count = db.Column(db.Integer, default=0)  # Non-deleted comments, maintained by add/delete_comment
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
+    # Composite indexes matching the (created_at, id) keyset used by the feeds
+    __table_args__ = (
+        db.Index('ix_note_public_feed', 'is_public', 'created_at', 'id'),
+        db.Index('ix_note_user_feed', 'user_id', 'created_at', 'id'),
+    )
+
     likes = db.relationship('Like', backref='note', lazy='dynamic', cascade='all, delete-orphan')
+    # Normalized copy of `tags`, used for indexed tag filtering
+    normalized_tags = db.relationship('Tag', secondary=note_tags, lazy='select', backref=db.backref('notes', lazy='dynamic'))
 
     def to_dict(self):
         return {
@@ -992,7 +1216,8 @@ class Note(db.Model):
             'is_expired': self.expiry_date and datetime.utcnow() > self.expiry_date,
             'views_count': self.views_count,
             'downloads_count': self.downloads_count,
-            'likes_count': self.likes.count(),
+            'likes_count': self.likes_count or 0,
+            'comments_count': self.comments_count or 0,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'author': {
@@ -1001,6 +1226,22 @@ class Note(db.Model):
             }
         }
 
+    def to_summary(self):
+        """Compact form embedded in other payloads; reads only columns already loaded"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'file_type': self.file_type,
+            'thumbnail': self.thumbnail_small,
+            'is_public': self.is_public
+        }
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    public_notes_count = db.Column(db.Integer, default=0, index=True)  # Maintained by adjust_tag_counts
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
@@ -1038,7 +1279,33 @@ class Comment(db.Model):
             'replies_count': self.replies.filter_by(is_deleted=False).count()
         }
 
-class Notification(db.Model):
+class NotificationPayloadMixin:
+    """to_dict shared by live and archived notifications"""
+
+    def to_dict(self, full=False):
+        """Embeds note/user summaries; full=True embeds their complete (query-heavy) to_dict payloads"""
+        if full:
+            related_note = self.related_note.to_dict() if self.related_note else None
+            related_user = self.related_user.to_dict() if self.related_user else None
+        else:
+            related_note = self.related_note.to_summary() if self.related_note else None
+            related_user = self.related_user.to_summary() if self.related_user else None
+
+        return {
+            'id': self.id,
+            'type': self.type,
+            'title': self.title,
+            'message': self.message,
+            'is_read': self.is_read,
+            'created_at': self.created_at.isoformat(),
+            'actor_count': self.actor_count or 1,
+            'recent_actor_ids': (self.recent_actor_ids or ([self.related_user_id] if self.related_user_id else []))[:NOTIFICATION_RECENT_ACTORS],
+            'related_note': related_note,
+            'related_user': related_user
+        }
+
+
+class Notification(NotificationPayloadMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     type = db.Column(db.String(50), nullable=False, index=True)  # 'like', 'comment', 'reply', 'follow'
@@ -1047,48 +1314,1074 @@ class Notification(db.Model):
     related_note_id = db.Column(db.Integer, db.ForeignKey('note.id'), nullable=True)
     related_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     related_comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True)
+    # Aggregation: events sharing a group_key ('like:<note_id>', 'follow:') fold into one row
+    group_key = db.Column(db.String(100), nullable=True)
+    actor_count = db.Column(db.Integer, default=1)
+    recent_actor_ids = db.Column(db.JSON, nullable=True)  # Distinct, most recent first, see NOTIFICATION_ACTOR_HISTORY
+    # Per-recipient sequence, bumped on every write (regroups included); the SSE event id and resume key
+    event_seq = db.Column(db.Integer, default=0)
     is_read = db.Column(db.Boolean, default=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        db.Index('ix_notification_group', 'user_id', 'group_key', 'is_read'),
+        db.Index('ix_notification_user_seq', 'user_id', 'event_seq'),
+    )
+
     recipient = db.relationship('User', foreign_keys=[user_id], backref='notifications')
     related_user = db.relationship('User', foreign_keys=[related_user_id])
     related_note = db.relationship('Note', foreign_keys=[related_note_id])
     related_comment = db.relationship('Comment', foreign_keys=[related_comment_id])
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'type': self.type,
-            'title': self.title,
-            'message': self.message,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat(),
-            'related_note': self.related_note.to_dict() if self.related_note else None,
-            'related_user': self.related_user.to_dict() if self.related_user else None
-        }
+
+class NotificationArchive(NotificationPayloadMixin, db.Model):
+    """Read notifications moved out of the live table by archive_old_notifications"""
+    # Same columns as Notification, ids preserved; plain columns because the archive outlives notes and users
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    related_note_id = db.Column(db.Integer, nullable=True)
+    related_user_id = db.Column(db.Integer, nullable=True)
+    related_comment_id = db.Column(db.Integer, nullable=True)
+    group_key = db.Column(db.String(100), nullable=True)
+    actor_count = db.Column(db.Integer, default=1)
+    recent_actor_ids = db.Column(db.JSON, nullable=True)
+    is_read = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_notification_archive_user_created', 'user_id', 'created_at'),
+    )
+
+    related_user = db.relationship('User', primaryjoin='foreign(NotificationArchive.related_user_id) == User.id', viewonly=True)
+    related_note = db.relationship('Note', primaryjoin='foreign(NotificationArchive.related_note_id) == Note.id', viewonly=True)
+
+
+class EngagementRollup(db.Model):
+    """Engagement event totals per note, event type and hour/day bucket"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Plain columns rather than foreign keys: history outlives deleted notes
+    note_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)  # Note owner
+    event_type = db.Column(db.String(20), nullable=False)  # 'view', 'download', 'like', 'comment'
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('note_id', 'event_type', 'granularity', 'bucket_start', name='unique_rollup_bucket'),
+        db.Index('ix_rollup_owner_range', 'user_id', 'granularity', 'bucket_start'),
+    )
+
+class UserSuggestion(db.Model):
+    """Precomputed follow suggestions, rebuilt nightly by rebuild_follow_suggestions"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 is the best suggestion
+    suggested_user_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    mutual_count = db.Column(db.Integer, default=0)  # Followed accounts that also follow the suggestion
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_notification(user_id, notification_type, title, message, related_note_id=None, related_user_id=None, related_comment_id=None):
-    """Helper function to create notifications"""
+def normalize_tag(name):
+    """Normalize a tag name for storage and lookup in the tag table"""
+    return name.strip().lower()[:100]
+
+def parse_tags(tags):
+    """Split a comma-separated tag string into unique normalized tag names"""
+    names = []
+    for name in (tags or '').split(','):
+        name = normalize_tag(name)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def get_or_create_tags(names):
+    """Return Tag rows for the given normalized names, creating any that don't exist"""
+    if not names:
+        return []
+
+    existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+    for name in names:
+        if name in existing:
+            continue
+        try:
+            # Savepoint so a concurrent insert of the same tag doesn't abort the caller's transaction
+            with db.session.begin_nested():
+                tag = Tag(name=name)
+                db.session.add(tag)
+            existing[name] = tag
+        except IntegrityError:
+            existing[name] = Tag.query.filter_by(name=name).one()
+
+    return [existing[name] for name in names]
+
+def set_note_tags(note, tags):
+    """Store the tag string on a note and sync its normalized tag rows"""
+    note.tags = tags
+    note.normalized_tags = get_or_create_tags(parse_tags(tags))
+
+POPULAR_TAGS_KEY = 'popular_tags:leaderboard'
+POPULAR_TAGS_SENTINEL = '__loaded__'  # Scored -1, marks a loaded leaderboard so an empty one is still cached
+
+# ARGV: delta, tag names...; tags whose count drops to 0 leave the leaderboard
+ADJUST_TAGS_IF_LOADED_SCRIPT = if_loaded("""
+        for n = 2, #ARGV do
+            redis.call('ZINCRBY', key, ARGV[1], ARGV[n])
+        end
+        redis.call('ZREMRANGEBYSCORE', key, '(-1', 0)""")
+
+def adjust_tag_counts(note, delta):
+    """
+    Add `delta` to the public note count of each of a note's tags, inside
+    the caller's transaction.
+    Returns: the change to hand to mirror_tag_counts once the commit succeeds
+    """
+    names = [tag.name for tag in note.normalized_tags]
+    if not names:
+        return None
+
+    Tag.query.filter(Tag.name.in_(names)).update(
+        {Tag.public_notes_count: Tag.public_notes_count + delta}, synchronize_session=False
+    )
+    return delta, names
+
+def mirror_tag_counts(change):
+    """
+    Apply a committed adjust_tag_counts change to the Redis leaderboard.
+    Best effort; drift is repaired by rebuild_tag_counts.
+    """
+    if not change or not redis_client:
+        return
+    delta, names = change
     try:
-        notification = Notification(
-            user_id=user_id,
-            type=notification_type,
-            title=title,
-            message=message,
-            related_note_id=related_note_id,
-            related_user_id=related_user_id,
-            related_comment_id=related_comment_id
-        )
-        db.session.add(notification)
+        redis_client.eval(ADJUST_TAGS_IF_LOADED_SCRIPT, 1, POPULAR_TAGS_KEY, delta, *names)
+    except Exception as e:
+        logger.warning(f"Tag leaderboard update error: {e}")
+
+def load_tag_leaderboard():
+    """Replace the Redis leaderboard with the counts in the tag table; returns {name: count}"""
+    counts = {tag.name: tag.public_notes_count for tag in Tag.query.filter(Tag.public_notes_count > 0)}
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.delete(POPULAR_TAGS_KEY)
+            pipe.zadd(POPULAR_TAGS_KEY, {POPULAR_TAGS_SENTINEL: -1, **counts})
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Tag leaderboard load error: {e}")
+    return counts
+
+def get_top_tags(limit):
+    """Return [(name, count)] for the most used public tags, from Redis or the tag table"""
+    if redis_client:
+        try:
+            entries = redis_client.zrevrangebyscore(POPULAR_TAGS_KEY, '+inf', '(0', start=0, num=limit, withscores=True)
+            if entries or redis_client.exists(POPULAR_TAGS_KEY):
+                return [(name, int(count)) for name, count in entries]
+            counts = load_tag_leaderboard()
+            return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        except Exception as e:
+            logger.warning(f"Tag leaderboard read error: {e}")
+
+    tags = Tag.query.filter(Tag.public_notes_count > 0).order_by(
+        Tag.public_notes_count.desc()
+    ).limit(limit).all()
+    return [(tag.name, tag.public_notes_count) for tag in tags]
+
+def rebuild_tag_counts():
+    """
+    Recompute every tag's public note count from scratch and reload the
+    Redis leaderboard.
+    Returns: number of tags in use by public notes
+    """
+    public_count = db.select(db.func.count()).select_from(note_tags).join(
+        Note, Note.id == note_tags.c.note_id
+    ).where(note_tags.c.tag_id == Tag.id, Note.is_public.is_(True)).scalar_subquery()
+
+    Tag.query.update({Tag.public_notes_count: public_count}, synchronize_session=False)
+    db.session.commit()
+
+    counts = load_tag_leaderboard()
+    logger.info(f"Rebuilt tag counts for {len(counts)} tags")
+    return len(counts)
+
+def filter_by_tag(query, tag):
+    """Restrict a Note query to notes carrying exactly `tag`, via the indexed tag tables"""
+    return query.join(note_tags, note_tags.c.note_id == Note.id).join(
+        Tag, Tag.id == note_tags.c.tag_id
+    ).filter(Tag.name == normalize_tag(tag))
+
+def note_surrogate_keys(note):
+    """Surrogate keys of every cached response a change to `note` can affect"""
+    keys = ['feed', 'tags', f"note:{note.id}", f"user:{note.user_id}"]
+    keys.extend(f"tag:{tag.name}" for tag in note.normalized_tags)
+    return keys
+
+def feed_surrogate_keys(result):
+    """Surrogate keys for a cached note listing: its filter plus every note and author in it"""
+    tag = request.args.get('tag', '')
+    keys = [f"tag:{normalize_tag(tag)}" if tag else 'feed']
+    for note in result.get('notes', []):
+        keys.append(f"note:{note['id']}")
+        keys.append(f"user:{note['author']['id']}")
+    return keys
+
+def encode_cursor(note):
+    """Encode a note's (or (id, created_at) row's) position as an opaque feed cursor"""
+    raw = json.dumps([note.created_at.isoformat(), note.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a feed cursor back into (created_at, id), raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(note_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+NOTE_CACHE_VERSION = 1  # Bump when Note.to_dict changes shape
+NOTE_CACHE_TIMEOUT = 3600
+
+def note_cache_key(note_id):
+    return f"note_obj:v{NOTE_CACHE_VERSION}:{note_id}"
+
+def invalidate_note_cache(*note_ids):
+    """Drop the cached dicts of the given notes after a write to them"""
+    if not redis_client or not note_ids:
+        return
+
+    try:
+        redis_client.delete(*[note_cache_key(note_id) for note_id in note_ids])
+    except Exception as e:
+        logger.warning(f"Note cache invalidation error: {e}")
+
+def serialize_notes(note_ids):
+    """
+    Serialize notes by id, in order, from the per-note object cache.
+
+    Cached dicts are fetched with one MGET; misses are loaded with their
+    authors in one query, serialized and written back. Engagement counts come
+    from the denormalized columns on Note, so no per-note queries are run.
+    """
+    cached = [None] * len(note_ids)
+    if redis_client and note_ids:
+        try:
+            cached = redis_client.mget([note_cache_key(note_id) for note_id in note_ids])
+        except Exception as e:
+            logger.warning(f"Note cache read error: {e}")
+
+    results = {}
+    now = datetime.utcnow()
+    for note_id, payload in zip(note_ids, cached):
+        if payload:
+            data = json.loads(payload)
+            # Expiry depends on the current time, so it is never served from cache
+            expiry_date = data['expiry_date']
+            data['is_expired'] = expiry_date and now > datetime.fromisoformat(expiry_date)
+            results[note_id] = data
+
+    missing = [note_id for note_id in note_ids if note_id not in results]
+    if missing:
+        notes = Note.query.options(db.joinedload(Note.author)).filter(Note.id.in_(missing)).all()
+        for note in notes:
+            results[note.id] = note.to_dict()
+
+        if redis_client and notes:
+            try:
+                pipe = redis_client.pipeline()
+                for note in notes:
+                    pipe.setex(note_cache_key(note.id), NOTE_CACHE_TIMEOUT, json.dumps(results[note.id], default=str))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Note cache write error: {e}")
+
+    return merge_pending_counters([results[note_id] for note_id in note_ids if note_id in results])
+
+USER_CARD_VERSION = 1  # Bump when User.to_dict changes shape
+USER_CARD_TIMEOUT = 3600
+
+def user_card_key(user_id):
+    return f"user_card:v{USER_CARD_VERSION}:{user_id}"
+
+def invalidate_user_cards(*user_ids):
+    """Drop the cached public profiles of the given users after a write to them"""
+    if not redis_client or not user_ids:
+        return
+    try:
+        redis_client.delete(*[user_card_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"User card invalidation error: {e}")
+
+def get_user_cards(user_ids):
+    """
+    Public profile dicts (User.to_dict) of the active users among `user_ids`,
+    in order. Cached per user; misses are loaded with one query.
+    """
+    results = {}
+    if redis_client and user_ids:
+        try:
+            for user_id, cached in zip(user_ids, redis_client.mget([user_card_key(user_id) for user_id in user_ids])):
+                if cached:
+                    results[user_id] = json.loads(cached)
+        except Exception as e:
+            logger.warning(f"User card read error: {e}")
+
+    missing = [user_id for user_id in user_ids if user_id not in results]
+    if missing:
+        users = User.query.filter(User.id.in_(missing), User.is_active.is_(True)).all()
+        for user in users:
+            results[user.id] = user.to_dict()
+
+        if redis_client and users:
+            try:
+                pipe = redis_client.pipeline()
+                for user in users:
+                    pipe.setex(user_card_key(user.id), USER_CARD_TIMEOUT, json.dumps(results[user.id], default=str))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"User card write error: {e}")
+
+    return [results[user_id] for user_id in user_ids if user_id in results]
+
+def adjust_user_counters(user_id, **deltas):
+    """Add deltas to a user's profile counters as SQL expressions in the current transaction"""
+    User.query.filter_by(id=user_id).update({
+        getattr(User, field): db.func.coalesce(getattr(User, field), 0) + delta
+        for field, delta in deltas.items() if delta
+    }, synchronize_session=False)
+
+def reconcile_user_counters():
+    """
+    Recompute the profile counters on User from the note and follows tables,
+    repairing any drift.
+    Returns: number of users whose counters were corrected
+    """
+    actual = {
+        User.public_notes_count: db.select(db.func.count(Note.id)).where(Note.user_id == User.id, Note.is_public.is_(True)).scalar_subquery(),
+        User.total_notes_count: db.select(db.func.count(Note.id)).where(Note.user_id == User.id).scalar_subquery(),
+        User.followers_count: db.select(db.func.count()).select_from(follows).where(follows.c.followed_id == User.id).scalar_subquery(),
+        User.following_count: db.select(db.func.count()).select_from(follows).where(follows.c.follower_id == User.id).scalar_subquery()
+    }
+
+    drifted = [user_id for (user_id,) in db.session.query(User.id).filter(db.or_(
+        *[db.or_(column.is_(None), column != count) for column, count in actual.items()]
+    ))]
+    if drifted:
+        User.query.filter(User.id.in_(drifted)).update(actual, synchronize_session=False)
+        db.session.commit()
+        invalidate_user_cards(*drifted)
+
+    logger.info(f"Reconciled profile counters for {len(drifted)} users")
+    return len(drifted)
+
+def record_note_counters(note_id, **deltas):
+    """Buffer view/download increments instead of updating the note row on every request"""
+    counter_buffer.ensure_flusher(flush_note_counters_in_context, COUNTER_FLUSH_INTERVAL)
+    counter_buffer.incr(note_id, **deltas)
+
+def merge_pending_counters(note_dicts):
+    """Add not-yet-flushed view/download increments to serialized notes so counts look live"""
+    pending = counter_buffer.pending([data['id'] for data in note_dicts])
+    for data in note_dicts:
+        for field, delta in pending[data['id']].items():
+            data[field] = (data[field] or 0) + delta
+    return note_dicts
+
+def flush_note_counters():
+    """
+    Apply buffered view/download increments to the note table with one
+    batched UPDATE.
+    Returns: number of notes updated
+    """
+    drained = counter_buffer.drain()
+    note_ids = set().union(*(deltas.keys() for deltas in drained.values()))
+    if not note_ids:
+        return 0
+
+    note_table = Note.__table__
+    statement = note_table.update().where(note_table.c.id == db.bindparam('note_id')).values(
+        views_count=db.func.coalesce(note_table.c.views_count, 0) + db.bindparam('views'),
+        downloads_count=db.func.coalesce(note_table.c.downloads_count, 0) + db.bindparam('downloads')
+    )
+    params = [{
+        'note_id': note_id,
+        'views': drained['views_count'].get(note_id, 0),
+        'downloads': drained['downloads_count'].get(note_id, 0)
+    } for note_id in note_ids]
+
+    try:
+        db.session.execute(statement, params)
         db.session.commit()
-        logger.debug(f"Notification created for user {user_id}: {notification_type}")
+    except Exception:
+        db.session.rollback()
+        # Put the increments back so the next flush retries them
+        for param in params:
+            counter_buffer.incr(param['note_id'], views_count=param['views'], downloads_count=param['downloads'])
+        raise
+
+    invalidate_note_cache(*note_ids)
+    logger.debug(f"Flushed view/download counters for {len(note_ids)} notes")
+    return len(note_ids)
+
+def flush_note_counters_in_context():
+    with app.app_context():
+        flush_note_counters()
+
+ANALYTICS_EVENT_FIELDS = {'view': 'views', 'download': 'downloads', 'like': 'likes', 'comment': 'comments'}
+ANALYTICS_BUCKETS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+ANALYTICS_MAX_BUCKETS = 24 * 31
+
+def record_engagement(event_type, note, delta=1):
+    """Append an engagement event for creator analytics"""
+    engagement_stream.ensure_compactor(compact_engagement_events_in_context, ENGAGEMENT_COMPACT_INTERVAL)
+    engagement_stream.record(event_type, note.id, note.user_id, delta)
+
+ENGAGEMENT_COMPACT_LOCK = 'lock:engagement_compactor'
+
+def compact_engagement_events():
+    """
+    Roll raw engagement events up into hourly and daily EngagementRollup
+    buckets batch by batch, removing each batch from the stream, until the
+    stream is empty or ENGAGEMENT_COMPACT_BUDGET seconds have passed.
+    Returns: number of events compacted
+    """
+    # One compactor at a time across workers, or buckets would be double counted.
+    # The lock is renewed before every batch, so it can't expire mid-run.
+    token = acquire_lock(ENGAGEMENT_COMPACT_LOCK, ENGAGEMENT_COMPACT_LOCK_TIMEOUT) if redis_client else 'local'
+    if not token:
+        return 0
+
+    compacted = 0
+    deadline = time.monotonic() + ENGAGEMENT_COMPACT_BUDGET
+    try:
+        while time.monotonic() < deadline:
+            if redis_client and not renew_lock(ENGAGEMENT_COMPACT_LOCK, token, ENGAGEMENT_COMPACT_LOCK_TIMEOUT):
+                logger.warning("Lost the engagement compactor lock, stopping")
+                break
+
+            batch = engagement_stream.read_batch()
+            if not batch:
+                break
+            compact_engagement_batch(batch)
+            compacted += len(batch)
+        return compacted
+    finally:
+        if redis_client:
+            release_lock(ENGAGEMENT_COMPACT_LOCK, token)
+
+def compact_engagement_batch(batch):
+    """Add one batch of events to the rollup buckets and remove it from the stream"""
+    totals = {}
+    owners = {}
+    for _, event in batch:
+        hour = datetime.utcfromtimestamp(event['ts']).replace(minute=0, second=0, microsecond=0)
+        for granularity, bucket_start in (('hour', hour), ('day', hour.replace(hour=0))):
+            key = (event['note_id'], event['type'], granularity, bucket_start)
+            totals[key] = totals.get(key, 0) + event['delta']
+        owners[event['note_id']] = event['owner_id']
+
+    try:
+        existing = EngagementRollup.query.filter(
+            EngagementRollup.note_id.in_({key[0] for key in totals}),
+            EngagementRollup.bucket_start.in_({key[3] for key in totals})
+        ).all()
+        rollups = {(row.note_id, row.event_type, row.granularity, row.bucket_start): row for row in existing}
+
+        for key, count in totals.items():
+            if key in rollups:
+                rollups[key].count += count
+            else:
+                note_id, event_type, granularity, bucket_start = key
+                db.session.add(EngagementRollup(
+                    note_id=note_id,
+                    user_id=owners[note_id],
+                    event_type=event_type,
+                    granularity=granularity,
+                    bucket_start=bucket_start,
+                    count=count
+                ))
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    engagement_stream.ack([event_id for event_id, _ in batch])
+    logger.debug(f"Compacted {len(batch)} engagement events into {len(totals)} buckets")
+
+def compact_engagement_events_in_context():
+    with app.app_context():
+        compact_engagement_events()
+
+def reconcile_note_counters():
+    """
+    Recompute Note.likes_count and Note.comments_count from the like and
+    comment tables, repairing any drift.
+    Returns: number of notes whose counters were corrected
+    """
+    likes = db.select(db.func.count(Like.id)).where(Like.note_id == Note.id).scalar_subquery()
+    comments = db.select(db.func.count(Comment.id)).where(
+        Comment.note_id == Note.id, Comment.is_deleted.is_(False)
+    ).scalar_subquery()
+
+    repaired = Note.query.filter(db.or_(
+        Note.likes_count.is_(None),
+        Note.comments_count.is_(None),
+        Note.likes_count != likes,
+        Note.comments_count != comments
+    )).update({Note.likes_count: likes, Note.comments_count: comments}, synchronize_session=False)
+    db.session.commit()
+
+    logger.info(f"Reconciled engagement counters for {repaired} notes")
+    return repaired
+
+CURSOR_PAGE_MAX = 100
+
+def paginate_notes(query, page, per_page, rank_order=None, cursor_mode=False):
+    """
+    Paginate a Note query newest first, by page number or by keyset cursor.
+
+    Clients that send `cursor` (empty for the first page) get `next_cursor`
+    back and skip the OFFSET scan; the exact `total` is only counted when they
+    also send `include_total=true`. Everyone else gets the page-number response.
+    `rank_order` (from search_index.search) sorts page-number results by
+    relevance; cursor pages always follow the (created_at, id) keyset.
+    `cursor_mode` forces cursor pagination, treating a missing cursor as ''.
+    Cursor pages hold between 1 and CURSOR_PAGE_MAX notes.
+    Only ids are selected; pass them to serialize_notes.
+    Returns: (note_ids: list, pagination: dict)
+    """
+    include_total = request.args.get('include_total', '').lower() == 'true'
+    keys_only = query.with_entities(Note.id, Note.created_at)
+    ordered = keys_only.order_by(Note.created_at.desc(), Note.id.desc())
+
+    if not cursor_mode and 'cursor' not in request.args:
+        if rank_order is not None:
+            ordered = keys_only.order_by(rank_order, Note.created_at.desc(), Note.id.desc())
+        notes = ordered.paginate(page=page, per_page=per_page, error_out=False)
+        return [row.id for row in notes.items], {
+            'total': notes.total,
+            'pages': notes.pages,
+            'current_page': page
+        }
+
+    per_page = max(1, min(per_page, CURSOR_PAGE_MAX))
+    cursor = request.args.get('cursor', '')
+    keyset = ordered
+    if cursor:
+        created_at, note_id = decode_cursor(cursor)
+        keyset = keyset.filter(db.or_(
+            Note.created_at < created_at,
+            db.and_(Note.created_at == created_at, Note.id < note_id)
+        ))
+
+    rows = keyset.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    pagination = {
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+        'has_more': has_more,
+        'per_page': per_page
+    }
+    if include_total:
+        pagination['total'] = query.order_by(None).count()
+
+    return [row.id for row in rows], pagination
+
+def followed_notes_query(user_id):
+    """Visible public notes by the users `user_id` follows (the pull-based feed)"""
+    followed_ids = db.select(follows.c.followed_id).where(follows.c.follower_id == user_id)
+    return Note.query.filter(Note.user_id.in_(followed_ids), Note.is_public.is_(True)).filter(
+        db.or_(Note.expiry_date.is_(None), Note.expiry_date > datetime.utcnow())
+    )
+
+def fan_out_note(note):
+    """Push a public note into its author's followers' timelines, or mark the author pull-only"""
+    if not timelines.available or not note.is_public:
+        return
+    try:
+        if timelines.is_pull_account(note.user_id):
+            return
+        followers = follow_graph.followers(note.user_id)
+        if len(followers) > FEED_FANOUT_FOLLOWER_LIMIT:
+            timelines.mark_pull_account(note.user_id)
+            return
+        timelines.push(followers, note.id, timeline_score(note.created_at))
+    except Exception as e:
+        logger.warning(f"Timeline fan-out error for note {note.id}: {e}")
+
+def retract_note(note):
+    """Remove a deleted or now-private note from its author's followers' timelines"""
+    if not timelines.available:
+        return
+    try:
+        if not timelines.is_pull_account(note.user_id):
+            timelines.retract(follow_graph.followers(note.user_id), note.id)
+    except Exception as e:
+        logger.warning(f"Timeline retract error for note {note.id}: {e}")
+
+def invalidate_timeline(user_id):
+    if not timelines.available:
+        return
+    try:
+        timelines.invalidate(user_id)
     except Exception as e:
-        logger.error(f"Error creating notification: {e}")
+        logger.warning(f"Timeline invalidation error for user {user_id}: {e}")
+
+def encode_feed_cursor(entry):
+    """Encode a timeline (score, note_id) position as an opaque feed cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(entry)).encode()).decode().rstrip('=')
+
+def decode_feed_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, note_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), int(note_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def read_timeline(user_id, before, count):
+    """
+    Newest following-feed entries older than `before`: the pushed timeline
+    (built from the database on first read) merged with the notes of followed
+    accounts too large to fan out.
+    Returns: [(score, note_id)]
+    """
+    entries = timelines.page(user_id, before, count)
+    if entries is None:
+        rows = followed_notes_query(user_id).with_entities(Note.id, Note.created_at).order_by(
+            Note.created_at.desc(), Note.id.desc()
+        ).limit(timelines.max_length).all()
+        timelines.build(user_id, [(timeline_score(row.created_at), row.id) for row in rows])
+        entries = timelines.page(user_id, before, count)
+
+    pull_ids = [author_id for author_id, following in follow_graph.following_among(user_id, timelines.pull_accounts()).items() if following]
+    if pull_ids:
+        pulled = Note.query.with_entities(Note.id, Note.created_at).filter(
+            Note.user_id.in_(pull_ids), Note.is_public.is_(True)
+        )
+        if before:
+            # Coarse bound in SQL, exact (score, id) comparison below
+            pulled = pulled.filter(Note.created_at <= datetime(1970, 1, 1) + timedelta(seconds=before[0] + 1))
+        rows = pulled.order_by(Note.created_at.desc(), Note.id.desc()).limit(count + 10).all()
+        entries = set(entries) | {(timeline_score(row.created_at), row.id) for row in rows}
+        entries = sorted((entry for entry in entries if not before or entry < before), reverse=True)
+
+    return entries[:count]
+
+SUGGESTIONS_TOP_K = int(os.getenv('SUGGESTIONS_TOP_K', 20))
+SUGGESTIONS_TAG_WEIGHT = float(os.getenv('SUGGESTIONS_TAG_WEIGHT', 2.0))
+
+def rebuild_follow_suggestions(chunk_size=1000):
+    """
+    Recompute the top SUGGESTIONS_TOP_K follow suggestions for every active
+    user from the follows table and public note tags, replacing the rows in
+    UserSuggestion one chunk of users per transaction.
+    Returns: number of users with suggestions
+    """
+    # numpy/scipy are only needed by this offline job, not by the web workers
+    from suggestions import compute_suggestions
+
+    user_ids = db.session.execute(db.select(User.id).where(User.is_active.is_(True)).order_by(User.id)).scalars().all()
+    follow_edges = db.session.execute(db.select(follows.c.follower_id, follows.c.followed_id)).all()
+    user_tag_counts = db.session.execute(
+        db.select(Note.user_id, note_tags.c.tag_id, db.func.count())
+        .join(note_tags, note_tags.c.note_id == Note.id)
+        .where(Note.is_public.is_(True))
+        .group_by(Note.user_id, note_tags.c.tag_id)
+    ).all()
+
+    computed_at = datetime.utcnow()
+    suggestion_table = UserSuggestion.__table__
+    batch, users = [], 0
+
+    def write(batch):
+        try:
+            db.session.execute(suggestion_table.delete().where(suggestion_table.c.user_id.in_({row['user_id'] for row in batch})))
+            db.session.execute(suggestion_table.insert(), batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    for user_id, ranked in compute_suggestions(user_ids, follow_edges, user_tag_counts, SUGGESTIONS_TOP_K, SUGGESTIONS_TAG_WEIGHT, chunk_size):
+        users += 1
+        batch.extend({
+            'user_id': user_id,
+            'rank': rank,
+            'suggested_user_id': suggested_id,
+            'score': score,
+            'mutual_count': mutual_count,
+            'computed_at': computed_at
+        } for rank, (suggested_id, score, mutual_count) in enumerate(ranked))
+        if len(batch) >= 5000:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+
+    # Users who no longer get any suggestion
+    UserSuggestion.query.filter(UserSuggestion.computed_at < computed_at).delete(synchronize_session=False)
+    db.session.commit()
+
+    logger.info(f"Rebuilt follow suggestions for {users} users")
+    return users
+
+NOTIFICATION_TEMPLATES = {
+    'like': ('New Like', '{actor} liked your note "{title}"'),
+    'comment': ('New Comment', '{actor} commented on your note "{title}"'),
+    'reply': ('New Reply', '{actor} replied to a comment on your note "{title}"'),
+    'comment_reply': ('New Reply', '{actor} replied to your comment on "{title}"'),
+    'follow': ('New Follower', '{actor} started following you'),
+}
+
+def queue_notification(user_id, notification_type, related_note_id=None, related_user_id=None, related_comment_id=None):
+    """Collect a notification event to be handed off by dispatch_notifications once the request commits"""
+    g.setdefault('pending_notifications', []).append({
+        'user_id': user_id,
+        'type': notification_type,
+        'related_note_id': related_note_id,
+        'related_user_id': related_user_id,
+        'related_comment_id': related_comment_id
+    })
+
+def dispatch_notifications():
+    """
+    Hand the notification events queued during this request to the dispatch
+    queue. Call after the endpoint's commit; rendering and writing the
+    notifications happens in the background.
+    """
+    pending = g.pop('pending_notifications', [])
+    if pending:
+        notification_dispatcher.submit(pending)
+
+def send_notification_batch(events):
+    """Dispatcher sink: deliver through Celery when NOTIFICATIONS_VIA_CELERY is set, otherwise in this process"""
+    if NOTIFICATIONS_VIA_CELERY and CELERY_AVAILABLE:
+        try:
+            deliver_notifications_task.delay(events)
+            return
+        except Exception as e:
+            logger.warning(f"Celery unavailable for notification delivery, delivering in-process: {e}")
+
+    with app.app_context():
+        deliver_notifications(events)
+
+notification_dispatcher = NotificationDispatcher(send_notification_batch, batch_window=NOTIFICATION_BATCH_WINDOW)
+
+NOTIFICATION_AGGREGATED_TYPES = {'like', 'comment', 'follow'}
+NOTIFICATION_AGGREGATION_WINDOW = timedelta(hours=int(os.getenv('NOTIFICATION_AGGREGATION_HOURS', 24)))
+NOTIFICATION_RECENT_ACTORS = 5  # Actor ids included in payloads
+# Distinct actors remembered per group, so a repeat actor isn't counted twice.
+# Only in groups with more actors than this can an actor who dropped off the
+# end be counted again.
+NOTIFICATION_ACTOR_HISTORY = 500
+
+def notification_group_key(event):
+    """Events with the same group key for the same recipient fold into one notification"""
+    if event['type'] not in NOTIFICATION_AGGREGATED_TYPES:
+        return None
+    return f"{event['type']}:{event.get('related_note_id') or ''}"
+
+def describe_actors(notification, usernames):
+    """'alice', 'alice and bob' or 'alice and 12 others'"""
+    names = [usernames.get(actor_id, 'Someone') for actor_id in notification.recent_actor_ids[:2]]
+    if notification.actor_count == 1:
+        return names[0]
+    if notification.actor_count == 2 and len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    others = notification.actor_count - 1
+    return f"{names[0]} and {others} other{'s' if others != 1 else ''}"
+
+def deliver_notifications(events):
+    """
+    Write a batch of notification events. Likes, comments and follows are
+    folded into the recipient's unread notification for the same target
+    from the last NOTIFICATION_AGGREGATION_WINDOW, bumping its actor count,
+    instead of adding a row per event. New rows are written in one batched insert.
+    Returns: number of notifications created or updated
+    """
+    events = NotificationDispatcher.dedupe(events)
+    if not events:
+        return 0
+
+    note_ids = {event['related_note_id'] for event in events if event.get('related_note_id')}
+    notes = {row.id: row for row in db.session.query(Note.id, Note.title, Note.user_id).filter(Note.id.in_(note_ids))} if note_ids else {}
+
+    groups = {}
+    group_keys = {notification_group_key(event) for event in events} - {None}
+    if group_keys:
+        open_groups = Notification.query.filter(
+            Notification.user_id.in_({event['user_id'] for event in events}),
+            Notification.group_key.in_(group_keys),
+            Notification.is_read.is_(False),
+            Notification.created_at >= datetime.utcnow() - NOTIFICATION_AGGREGATION_WINDOW
+        ).order_by(Notification.created_at).all()
+        groups = {(notification.user_id, notification.group_key): notification for notification in open_groups}
+
+    actor_ids = {event['related_user_id'] for event in events if event.get('related_user_id')}
+    for notification in groups.values():
+        actor_ids.update((notification.recent_actor_ids or [])[:2])  # The names describe_actors shows
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(actor_ids)).all()) if actor_ids else {}
+
+    created, touched = [], []
+    for event in events:
+        note = notes.get(event.get('related_note_id'))
+        actor_id = event.get('related_user_id')
+        if actor_id not in usernames or (event.get('related_note_id') and note is None):
+            continue  # Actor or note deleted since the event was queued
+
+        group_key = notification_group_key(event)
+        notification = groups.get((event['user_id'], group_key)) if group_key else None
+        if notification is None:
+            notification = Notification(
+                user_id=event['user_id'],
+                type=event['type'],
+                group_key=group_key,
+                actor_count=0,
+                recent_actor_ids=[],
+                related_note_id=event.get('related_note_id')
+            )
+            db.session.add(notification)
+            created.append(notification)
+            if group_key:
+                groups[(event['user_id'], group_key)] = notification
+        if notification not in touched:
+            touched.append(notification)
+
+        previous_actors = notification.recent_actor_ids or []
+        if actor_id not in previous_actors:
+            notification.actor_count = (notification.actor_count or 0) + 1
+        # Reassigned rather than mutated so the JSON column is marked dirty
+        notification.recent_actor_ids = ([actor_id] + [a for a in previous_actors if a != actor_id])[:NOTIFICATION_ACTOR_HISTORY]
+        notification.related_user_id = actor_id
+        notification.related_comment_id = event.get('related_comment_id')
+        notification.created_at = datetime.utcnow()  # Regrouped notifications move back to the top
+
+        template = event['type']
+        if template == 'reply' and note.user_id != event['user_id']:
+            template = 'comment_reply'
+        notification.title, message = NOTIFICATION_TEMPLATES[template]
+        notification.message = message.format(actor=describe_actors(notification, usernames), title=note.title if note else '')
+
+    if not touched:
+        return 0
+
+    try:
+        touched_per_user = {}
+        for notification in touched:
+            touched_per_user.setdefault(notification.user_id, []).append(notification)
+        for recipient_id, notifications in touched_per_user.items():
+            for notification, seq in zip(notifications, next_notification_seqs(recipient_id, len(notifications))):
+                notification.event_seq = seq
+        db.session.commit()
+    except Exception:
         db.session.rollback()
+        raise
+
+    created_per_user = {}
+    for notification in created:
+        count, seq = created_per_user.get(notification.user_id, (0, 0))
+        created_per_user[notification.user_id] = (count + 1, max(seq, notification.event_seq))
+    for recipient_id, (count, seq) in created_per_user.items():
+        adjust_unread_count(recipient_id, count, seq)
+
+    publish_notifications([notification.id for notification in touched])
+
+    logger.debug(f"Delivered {len(events)} notification events as {len(created)} new and {len(touched) - len(created)} regrouped notifications")
+    return len(touched)
+
+def next_notification_seqs(user_id, count):
+    """
+    Reserve `count` event sequence numbers for a user's notifications. The
+    counter row stays locked until commit, so concurrent deliveries to the
+    same user commit in sequence order and a resume point never skips a write.
+    """
+    last = db.session.execute(
+        db.update(User).where(User.id == user_id)
+        .values(notification_seq=db.func.coalesce(User.notification_seq, 0) + count)
+        .returning(User.notification_seq)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    return range(last - count + 1, last + 1)
+
+def publish_notifications(notification_ids):
+    """Push newly written notifications to their recipients' open streams"""
+    notifications = Notification.query.options(
+        db.selectinload(Notification.related_note), db.selectinload(Notification.related_user)
+    ).filter(Notification.id.in_(notification_ids)).order_by(Notification.event_seq).all()
+
+    for notification in notifications:
+        notification_hub.publish(notification.user_id, 'notification', notification.to_dict(), event_id=notification.event_seq)
+
+def format_sse(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+UNREAD_COUNT_TIMEOUT = 86400  # Counters are rebuilt from the table at least daily
+
+# Counters are hashes of `count` and `seq`, the highest Notification.event_seq
+# already reflected in count. Loading counts the table and reads that seq in
+# one statement, so an increment for notifications the load already counted
+# carries a seq no higher than the stored one and is skipped.
+# ARGV: delta, seq of the newest notification being counted ('' for decrements)
+ADJUST_UNREAD_SCRIPT = if_loaded("""
+        if ARGV[2] == '' or tonumber(ARGV[2]) > tonumber(redis.call('HGET', key, 'seq') or '0') then
+            result = redis.call('HINCRBY', key, 'count', ARGV[1])
+            if ARGV[2] ~= '' then
+                redis.call('HSET', key, 'seq', ARGV[2])
+            end
+        else
+            result = tonumber(redis.call('HGET', key, 'count'))
+        end""")
+
+# ARGV: count, seq, timeout, overwrite ('1' to replace a counter holding an older seq)
+STORE_UNREAD_SCRIPT = """
+local seq = redis.call('HGET', KEYS[1], 'seq')
+if seq and (ARGV[4] ~= '1' or tonumber(seq) > tonumber(ARGV[2])) then
+    return tonumber(redis.call('HGET', KEYS[1], 'count'))
+end
+redis.call('HSET', KEYS[1], 'count', ARGV[1], 'seq', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tonumber(ARGV[1])
+"""
+
+def unread_count_key(user_id):
+    return f"notifications:unread_count:{user_id}"
+
+def count_unread(user_ids):
+    """Return {user_id: (unread count, highest event_seq)} from the table, in one statement"""
+    rows = db.session.query(
+        Notification.user_id,
+        db.func.sum(db.case((Notification.is_read.is_(False), 1), else_=0)),
+        db.func.max(Notification.event_seq)
+    ).filter(Notification.user_id.in_(user_ids)).group_by(Notification.user_id).all()
+    counts = {user_id: (0, 0) for user_id in user_ids}
+    counts.update({user_id: (int(unread or 0), int(seq or 0)) for user_id, unread, seq in rows})
+    return counts
+
+def adjust_unread_count(user_id, delta, seq=None):
+    """
+    Atomically add `delta` to a user's cached unread notification count.
+    Increments for new notifications pass `seq`, the highest event_seq among
+    them, so they aren't applied on top of a load that already counted them.
+    """
+    if not redis_client or not delta:
+        return
+
+    try:
+        count = redis_client.eval(ADJUST_UNREAD_SCRIPT, 1, unread_count_key(user_id), delta, '' if seq is None else seq)
+    except Exception as e:
+        logger.warning(f"Unread count update error for user {user_id}: {e}")
+        return
+
+    if count is None:
+        count = get_unread_count(user_id)
+    notification_hub.publish(user_id, 'unread_count', {'unread_count': int(count)})
+
+def get_unread_count(user_id):
+    """Return a user's unread notification count, one Redis HGET when the counter is warm"""
+    if redis_client:
+        try:
+            cached = redis_client.hget(unread_count_key(user_id), 'count')
+            if cached is not None and int(cached) >= 0:
+                return int(cached)
+        except Exception as e:
+            logger.warning(f"Unread count read error for user {user_id}: {e}")
+
+    count, seq = count_unread([user_id])[user_id]
+    if redis_client:
+        try:
+            # Keep a counter another request loaded (and maybe adjusted) meanwhile
+            return redis_client.eval(STORE_UNREAD_SCRIPT, 1, unread_count_key(user_id), count, seq, UNREAD_COUNT_TIMEOUT, 0)
+        except Exception as e:
+            logger.warning(f"Unread count write error for user {user_id}: {e}")
+    return count
+
+def reconcile_unread_counts():
+    """
+    Reset every cached unread counter to the count in the notification table,
+    repairing drift from failed updates. Counters that took an increment
+    newer than the recount are left alone.
+    Returns: number of counters corrected
+    """
+    if not redis_client:
+        return 0
+
+    keys = list(redis_client.scan_iter(match=unread_count_key('*'), count=1000))
+    repaired = 0
+    for start in range(0, len(keys), 1000):
+        chunk = keys[start:start + 1000]
+        user_ids = [int(key.rsplit(':', 1)[1]) for key in chunk]
+        actual = count_unread(user_ids)
+
+        pipe = redis_client.pipeline()
+        for key in chunk:
+            pipe.hget(key, 'count')
+        cached = pipe.execute()
+        for key, user_id, value in zip(chunk, user_ids, cached):
+            count, seq = actual[user_id]
+            if value is not None and int(value) != count:
+                redis_client.eval(STORE_UNREAD_SCRIPT, 1, key, count, seq, UNREAD_COUNT_TIMEOUT, 1)
+                repaired += 1
+
+    logger.info(f"Reconciled {repaired} unread notification counters")
+    return repaired
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 90))
+NOTIFICATION_RETENTION_MODE = os.getenv('NOTIFICATION_RETENTION_MODE', 'archive')  # 'archive' or 'delete'
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.getenv('NOTIFICATION_ARCHIVE_BATCH_SIZE', 500))
+
+def archive_old_notifications(retention_days=None, batch_size=None):
+    """
+    Move read notifications older than the retention period into
+    NotificationArchive (or delete them when NOTIFICATION_RETENTION_MODE is
+    'delete'). Works in small batches, each its own short transaction, so
+    the live table is never locked for long. Unread notifications are kept.
+    Returns: number of notifications removed from the live table
+    """
+    retention_days = NOTIFICATION_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or NOTIFICATION_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    live = Notification.__table__
+    columns = [column.name for column in NotificationArchive.__table__.columns if column.name != 'archived_at']
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            db.select(live.c.id).where(live.c.is_read.is_(True), live.c.created_at < cutoff).order_by(live.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        try:
+            if NOTIFICATION_RETENTION_MODE == 'archive':
+                rows = db.select(*[live.c[column] for column in columns], db.literal(datetime.utcnow()).label('archived_at')).where(live.c.id.in_(ids))
+                db.session.execute(NotificationArchive.__table__.insert().from_select(columns + ['archived_at'], rows))
+            db.session.execute(live.delete().where(live.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    logger.info(f"{'Archived' if NOTIFICATION_RETENTION_MODE == 'archive' else 'Deleted'} {moved} notifications older than {retention_days} days")
+    return moved
 
 def create_thumbnails_s3(file_obj, filename):
     """Create thumbnails and upload to S3 or local storage"""
@@ -1251,16 +2544,22 @@ def upload_note():
             file_size=file_size,
             file_type=file_type,
             file_url=file_url,
-            tags=tags,
             is_public=is_public,
             allow_comments=allow_comments,
             allow_downloads=allow_downloads,
             expiry_date=expiry_date,
             user_id=user_id
         )
+        set_note_tags(note, tags)
 
         db.session.add(note)
+        tag_change = adjust_tag_counts(note, 1) if is_public else None
+        adjust_user_counters(user_id, total_notes_count=1, public_notes_count=1 if is_public else 0)
         db.session.commit()
+        mirror_tag_counts(tag_change)
+        purge_cache(*note_surrogate_keys(note))
+        invalidate_user_cards(user_id)
+        fan_out_note(note)
 
         # Process thumbnails for images
         if file_type in ['png', 'jpg', 'jpeg', 'gif']:
@@ -1273,6 +2572,7 @@ def upload_note():
                     note.thumbnail_medium = thumbnails.get('medium')
                     note.thumbnail_large = thumbnails.get('large')
                     db.session.commit()
+                    invalidate_note_cache(note.id)
                     logger.info(f"Created thumbnails for {filename}")
             except Exception as e:
                 logger.warning(f"Thumbnail creation failed for {filename}: {e}")
@@ -1368,9 +2668,9 @@ def download_file(note_id):
                 return jsonify({'error': 'Invalid token'}), 401
 
         # Increment view count and download count
-        note.views_count += 1
-        note.downloads_count += 1
-        db.session.commit()
+        record_note_counters(note.id, views_count=1, downloads_count=1)
+        record_engagement('view', note)
+        record_engagement('download', note)
 
         if s3_service.use_s3:
             # Generate presigned URL for download
@@ -1399,31 +2699,74 @@ def download_file(note_id):
         logger.error(f"Error downloading file for note {note_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+BATCH_LOOKUP_MAX_IDS = 200
+
+def parse_id_list(raw):
+    """Parse an `ids=1,2,3` argument into unique ints in request order, raising ValueError if malformed"""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(',') if part.strip()))
+    except ValueError:
+        raise ValueError('ids must be a comma-separated list of integers')
+    if len(ids) > BATCH_LOOKUP_MAX_IDS:
+        raise ValueError(f'At most {BATCH_LOOKUP_MAX_IDS} ids per request')
+    return ids
+
 @app.route('/api/notes', methods=['GET'])
-@cache_result('notes', 300)
 def get_notes():
+    """List public notes, or look up specific notes with ?ids=1,2,3"""
+    if 'ids' in request.args:
+        return get_notes_by_ids()
+    return list_public_notes()
+
+def get_notes_by_ids():
+    """Notes visible to the caller (public, or their own) among `ids`, in request order"""
+    try:
+        note_ids = parse_id_list(request.args.get('ids', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        verify_jwt_in_request(optional=True)
+        viewer_id = get_current_user_id()
+    except Exception:
+        return jsonify({'error': 'Invalid token'}), 401
+
+    visible = set()
+    if note_ids:
+        rows = db.session.query(Note.id, Note.user_id, Note.is_public).filter(Note.id.in_(note_ids)).all()
+        visible = {row.id for row in rows if row.is_public or (viewer_id is not None and row.user_id == viewer_id)}
+
+    notes = serialize_notes([note_id for note_id in note_ids if note_id in visible])
+    found = {note['id'] for note in notes}
+    return jsonify({
+        'notes': notes,
+        'missing': [note_id for note_id in note_ids if note_id not in found]
+    })
+
+@cache_result('notes', 3600, surrogate_keys=feed_surrogate_keys)
+def list_public_notes():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 12, type=int)
     search = request.args.get('search', '')
     tag = request.args.get('tag', '')
 
     query = Note.query.filter_by(is_public=True)
+    rank_order = None
 
     if search:
-        query = query.filter(Note.title.contains(search) | Note.description.contains(search))
+        query, rank_order = search_index.search(query, Note, search)
 
     if tag:
-        query = query.filter(Note.tags.contains(tag))
+        query = filter_by_tag(query, tag)
 
-    notes = query.order_by(Note.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        notes, pagination = paginate_notes(query, page, per_page, rank_order)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return {
-        'notes': [note.to_dict() for note in notes.items],
-        'total': notes.total,
-        'pages': notes.pages,
-        'current_page': page
+        'notes': serialize_notes(notes),
+        **pagination
     }
 
 @app.route('/api/notes/<int:note_id>', methods=['GET'])
@@ -1443,10 +2786,10 @@ def get_note(note_id):
         except:
             return jsonify({'error': 'Invalid token'}), 401
 
-    note.views_count += 1
-    db.session.commit()
+    record_note_counters(note.id, views_count=1)
+    record_engagement('view', note)
 
-    return jsonify(note.to_dict())
+    return jsonify(merge_pending_counters([note.to_dict()])[0])
 
 @app.route('/api/notes/<int:note_id>/like', methods=['POST'])
 @jwt_required()
@@ -1456,36 +2799,75 @@ def toggle_like(note_id):
 
     existing_like = Like.query.filter_by(user_id=user_id, note_id=note_id).first()
 
+    # Counter updates are emitted as SQL expressions so concurrent likes can't lose increments
     if existing_like:
         db.session.delete(existing_like)
+        note.likes_count = Note.likes_count - 1
         message = 'Note unliked'
         liked = False
     else:
         like = Like(user_id=user_id, note_id=note_id)
         db.session.add(like)
+        note.likes_count = Note.likes_count + 1
         message = 'Note liked'
         liked = True
 
         # Create notification for note owner (if not liking own note)
         if note.user_id != user_id:
-            liker = User.query.get(user_id)
-            create_notification(
+            queue_notification(
                 user_id=note.user_id,
                 notification_type='like',
-                title='New Like',
-                message=f'{liker.username} liked your note "{note.title}"',
                 related_note_id=note_id,
                 related_user_id=user_id
             )
 
     db.session.commit()
+    dispatch_notifications()
+    purge_cache(f"note:{note_id}")
+    invalidate_note_cache(note_id)
+    record_engagement('like', note, 1 if liked else -1)
 
     return jsonify({
         'message': message,
         'liked': liked,
-        'likes_count': len(note.likes)
+        'likes_count': note.likes_count
     })
 
+@app.route('/api/feed', methods=['GET'])
+@jwt_required()
+def get_feed():
+    """Newest public notes from the users the current user follows, paged with `cursor`"""
+    user_id = get_jwt_identity()
+    per_page = min(50, max(1, request.args.get('per_page', 20, type=int)))
+
+    try:
+        if not timelines.available:
+            note_ids, pagination = paginate_notes(followed_notes_query(user_id), 1, per_page, cursor_mode=True)
+            return jsonify({'notes': serialize_notes(note_ids), **pagination})
+
+        cursor = request.args.get('cursor', '')
+        entries = read_timeline(user_id, decode_feed_cursor(cursor) if cursor else None, per_page + 1)
+        has_more = len(entries) > per_page
+        entries = entries[:per_page]
+
+        # Skip anything deleted, expired or made private since it was pushed
+        notes = [note for note in serialize_notes([note_id for _, note_id in entries])
+                 if note['is_public'] and not note['is_expired']]
+
+        return jsonify({
+            'notes': notes,
+            'next_cursor': encode_feed_cursor(entries[-1]) if has_more else None,
+            'has_more': has_more,
+            'per_page': per_page
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Error getting feed for user {user_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/my-notes', methods=['GET'])
 @jwt_required()
 def get_my_notes():
@@ -1493,17 +2875,92 @@ def get_my_notes():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 12, type=int)
 
-    notes = Note.query.filter_by(user_id=user_id).order_by(Note.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        notes, pagination = paginate_notes(Note.query.filter_by(user_id=user_id), page, per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
-        'notes': [note.to_dict() for note in notes.items],
-        'total': notes.total,
-        'pages': notes.pages,
-        'current_page': page
+        'notes': serialize_notes(notes),
+        **pagination
     })
 
+def parse_utc_datetime(value):
+    """Parse an ISO 8601 datetime as naive UTC, converting any offset; raises ValueError if malformed"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@app.route('/api/my-notes/analytics', methods=['GET'])
+@jwt_required()
+def get_my_notes_analytics():
+    """Engagement over time for the current user's notes, answered from rollup buckets"""
+    try:
+        user_id = get_jwt_identity()
+        granularity = request.args.get('granularity', 'day')
+        note_id = request.args.get('note_id', type=int)
+
+        if granularity not in ANALYTICS_BUCKETS:
+            return jsonify({'error': 'granularity must be "hour" or "day"'}), 400
+
+        step = ANALYTICS_BUCKETS[granularity]
+        try:
+            end = parse_utc_datetime(request.args['end']) if request.args.get('end') else datetime.utcnow()
+            start = parse_utc_datetime(request.args['start']) if request.args.get('start') else end - step * 30
+        except (ValueError, OverflowError):
+            return jsonify({'error': 'start and end must be ISO 8601 datetimes'}), 400
+
+        if start >= end:
+            return jsonify({'error': 'start must be before end'}), 400
+        if (end - start) / step > ANALYTICS_MAX_BUCKETS:
+            return jsonify({'error': f'Range too large (max {ANALYTICS_MAX_BUCKETS} {granularity} buckets)'}), 400
+
+        if granularity == 'hour':
+            start = start.replace(minute=0, second=0, microsecond=0)
+        else:
+            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        query = db.session.query(
+            EngagementRollup.bucket_start,
+            EngagementRollup.event_type,
+            db.func.sum(EngagementRollup.count)
+        ).filter(
+            EngagementRollup.user_id == user_id,
+            EngagementRollup.granularity == granularity,
+            EngagementRollup.bucket_start >= start,
+            EngagementRollup.bucket_start < end
+        )
+        if note_id:
+            query = query.filter(EngagementRollup.note_id == note_id)
+
+        rows = query.group_by(EngagementRollup.bucket_start, EngagementRollup.event_type).order_by(
+            EngagementRollup.bucket_start
+        ).all()
+
+        buckets = {}
+        totals = {field: 0 for field in ANALYTICS_EVENT_FIELDS.values()}
+        for bucket_start, event_type, count in rows:
+            field = ANALYTICS_EVENT_FIELDS.get(event_type)
+            if not field:
+                continue
+            bucket = buckets.setdefault(bucket_start, {f: 0 for f in ANALYTICS_EVENT_FIELDS.values()})
+            bucket[field] += count
+            totals[field] += count
+
+        return jsonify({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'note_id': note_id,
+            'series': [{'bucket': bucket_start.isoformat(), **counts} for bucket_start, counts in buckets.items()],
+            'totals': totals
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting analytics for user {user_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/notes/<int:note_id>', methods=['DELETE'])
 @jwt_required()
 def delete_note(note_id):
@@ -1544,8 +3001,16 @@ def delete_note(note_id):
         logger.error(f"Error during file cleanup for note {note_id}: {e}")
 
     # Delete from database
+    tag_change = adjust_tag_counts(note, -1) if note.is_public else None
+    adjust_user_counters(note.user_id, total_notes_count=-1, public_notes_count=-1 if note.is_public else 0)
+    stale_keys = note_surrogate_keys(note)
     db.session.delete(note)
     db.session.commit()
+    mirror_tag_counts(tag_change)
+    purge_cache(*stale_keys)
+    invalidate_note_cache(note_id)
+    invalidate_user_cards(note.user_id)
+    retract_note(note)
 
     logger.info(f"Note {note_id} deleted successfully")
     return jsonify({'message': 'Note deleted successfully'})
@@ -1566,8 +3031,15 @@ def update_note_permissions(note_id):
             return jsonify({'error': 'Request body is required'}), 400
 
         # Update permissions
+        visibility_changed = False
+        tag_change = None
         if 'is_public' in data:
-            note.is_public = bool(data['is_public'])
+            is_public = bool(data['is_public'])
+            if is_public != note.is_public:
+                tag_change = adjust_tag_counts(note, 1 if is_public else -1)
+                adjust_user_counters(note.user_id, public_notes_count=1 if is_public else -1)
+                visibility_changed = True
+            note.is_public = is_public
 
         if 'allow_comments' in data:
             note.allow_comments = bool(data['allow_comments'])
@@ -1586,6 +3058,15 @@ def update_note_permissions(note_id):
 
         note.updated_at = datetime.utcnow()
         db.session.commit()
+        mirror_tag_counts(tag_change)
+        purge_cache(*note_surrogate_keys(note))
+        invalidate_note_cache(note_id)
+        if visibility_changed:
+            invalidate_user_cards(user_id)
+        if visibility_changed and note.is_public:
+            fan_out_note(note)
+        elif visibility_changed:
+            retract_note(note)
 
         logger.info(f"Permissions updated for note {note_id} by user {user_id}")
         return jsonify({
@@ -1763,6 +3244,8 @@ def update_profile():
         if not data:
             return jsonify({'error': 'Request body is required'}), 400
 
+        username_changed = False
+
         # Update allowed fields
         if 'bio' in data:
             bio = data['bio']
@@ -1809,6 +3292,7 @@ def update_profile():
             if existing_user:
                 return jsonify({'error': 'Username already exists'}), 400
 
+            username_changed = new_username != user.username
             user.username = new_username
 
         # Email update with validation
@@ -1824,6 +3308,12 @@ def update_profile():
 
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_user_cards(user.id)
+
+        if username_changed:
+            # Cached note dicts embed the author's username
+            invalidate_note_cache(*[note_id for (note_id,) in db.session.query(Note.id).filter_by(user_id=user.id)])
+            purge_cache(f"user:{user.id}")
 
         logger.info(f"Profile updated for user {user_id}")
         return jsonify({
@@ -1836,12 +3326,33 @@ def update_profile():
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/users', methods=['GET'])
+def get_users_by_ids():
+    """Public profiles of the active users among ?ids=1,2,3, in request order"""
+    try:
+        user_ids = parse_id_list(request.args.get('ids', ''))
+        users = get_user_cards(user_ids)
+        found = {user['id'] for user in users}
+        return jsonify({
+            'users': users,
+            'missing': [user_id for user_id in user_ids if user_id not in found]
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Error getting users by ids: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user_profile(user_id):
     """Get public user profile"""
     try:
-        user = User.query.filter_by(id=user_id, is_active=True).first_or_404()
-        return jsonify(user.to_dict())
+        cards = get_user_cards([user_id])
+        if not cards:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify(cards[0])
 
     except Exception as e:
         logger.error(f"Error getting user profile {user_id}: {e}")
@@ -1864,14 +3375,25 @@ def follow_user(user_id):
         if current_user.is_following(user_to_follow):
             return jsonify({'error': 'Already following this user'}), 400
 
-        current_user.follow(user_to_follow)
+        current_user.followed.append(user_to_follow)
+        adjust_user_counters(current_user_id, following_count=1)
+        adjust_user_counters(user_id, followers_count=1)
+        queue_notification(
+            user_id=user_id,
+            notification_type='follow',
+            related_user_id=current_user_id
+        )
         db.session.commit()
+        follow_graph.add(current_user_id, user_id)
+        invalidate_user_cards(current_user_id, user_id)
+        invalidate_timeline(current_user_id)
+        dispatch_notifications()
 
         logger.info(f"User {current_user_id} followed user {user_id}")
         return jsonify({
             'message': 'Successfully followed user',
             'following': True,
-            'followers_count': user_to_follow.followers.count()
+            'followers_count': follow_graph.follower_count(user_id)
         })
 
     except Exception as e:
@@ -1896,14 +3418,19 @@ def unfollow_user(user_id):
         if not current_user.is_following(user_to_unfollow):
             return jsonify({'error': 'Not following this user'}), 400
 
-        current_user.unfollow(user_to_unfollow)
+        current_user.followed.remove(user_to_unfollow)
+        adjust_user_counters(current_user_id, following_count=-1)
+        adjust_user_counters(user_id, followers_count=-1)
         db.session.commit()
+        follow_graph.remove(current_user_id, user_id)
+        invalidate_user_cards(current_user_id, user_id)
+        invalidate_timeline(current_user_id)
 
         logger.info(f"User {current_user_id} unfollowed user {user_id}")
         return jsonify({
             'message': 'Successfully unfollowed user',
             'following': False,
-            'followers_count': user_to_unfollow.followers.count()
+            'followers_count': follow_graph.follower_count(user_id)
         })
 
     except Exception as e:
@@ -1921,11 +3448,10 @@ def get_follow_status(user_id):
         if current_user_id == user_id:
             return jsonify({'following': False, 'is_self': True})
 
-        current_user = User.query.get_or_404(current_user_id)
-        target_user = User.query.filter_by(id=user_id, is_active=True).first_or_404()
+        User.query.filter_by(id=user_id, is_active=True).with_entities(User.id).first_or_404()
 
         return jsonify({
-            'following': current_user.is_following(target_user),
+            'following': follow_graph.is_following(current_user_id, user_id),
             'is_self': False
         })
 
@@ -1933,29 +3459,82 @@ def get_follow_status(user_id):
         logger.error(f"Error checking follow status for user {user_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/users/follow-status', methods=['POST'])
+@jwt_required()
+def get_bulk_follow_status():
+    """Check which of up to 100 users the current user follows, e.g. {"user_ids": [1, 2, 3]}"""
+    try:
+        current_user_id = get_jwt_identity()
+        user_ids = (request.get_json(silent=True) or {}).get('user_ids')
+
+        # type() rather than isinstance: JSON true/false arrive as bool, a subclass of int
+        if not isinstance(user_ids, list) or not all(type(uid) is int for uid in user_ids):
+            return jsonify({'error': 'user_ids must be a list of integers'}), 400
+        if len(user_ids) > 100:
+            return jsonify({'error': 'At most 100 user_ids per request'}), 400
+
+        following = follow_graph.following_among(current_user_id, user_ids)
+        return jsonify({
+            'following': {str(uid): following[uid] and uid != current_user_id for uid in following}
+        })
+
+    except Exception as e:
+        logger.error(f"Error checking bulk follow status for user {current_user_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/users/suggestions', methods=['GET'])
+@jwt_required()
+def get_follow_suggestions():
+    """Accounts to follow, from the nightly precomputed suggestions"""
+    try:
+        current_user_id = get_jwt_identity()
+        limit = max(1, min(SUGGESTIONS_TOP_K, request.args.get('limit', 10, type=int)))
+
+        rows = db.session.query(UserSuggestion, User).join(
+            User, User.id == UserSuggestion.suggested_user_id
+        ).filter(
+            UserSuggestion.user_id == current_user_id, User.is_active.is_(True)
+        ).order_by(UserSuggestion.rank).all()
+
+        # Suggestions are up to a day old; skip accounts followed since
+        following = follow_graph.following_among(current_user_id, [user.id for _, user in rows])
+        suggestions = [{
+            'user': user.to_summary(),
+            'mutual_count': suggestion.mutual_count,
+            'score': round(suggestion.score, 3)
+        } for suggestion, user in rows if not following.get(user.id)][:limit]
+
+        return jsonify({'suggestions': suggestions})
+
+    except Exception as e:
+        logger.error(f"Error getting follow suggestions for user {current_user_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/users/<int:user_id>/notes', methods=['GET'])
 def get_user_notes(user_id):
     """Get public notes from a specific user"""
     try:
-        user = User.query.filter_by(id=user_id, is_active=True).first_or_404()
+        cards = get_user_cards([user_id])
+        if not cards:
+            return jsonify({'error': 'User not found'}), 404
 
         page = request.args.get('page', 1, type=int)
         per_page = min(50, request.args.get('per_page', 12, type=int))
 
-        notes = Note.query.filter_by(user_id=user_id, is_public=True).filter(
+        query = Note.query.filter_by(user_id=user_id, is_public=True).filter(
             db.or_(Note.expiry_date.is_(None), Note.expiry_date > datetime.utcnow())
-        ).order_by(Note.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
         )
+        notes, pagination = paginate_notes(query, page, per_page)
 
         return jsonify({
-            'user': user.to_dict(),
-            'notes': [note.to_dict() for note in notes.items],
-            'total': notes.total,
-            'pages': notes.pages,
-            'current_page': page
+            'user': cards[0],
+            'notes': serialize_notes(notes),
+            **pagination
         })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     except Exception as e:
         logger.error(f"Error getting notes for user {user_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -1993,6 +3572,7 @@ def upload_avatar():
         user.avatar_url = avatar_url
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_user_cards(user_id)
 
         logger.info(f"Avatar uploaded for user {user_id}")
         return jsonify({
@@ -2069,6 +3649,7 @@ def admin_toggle_user_status(user_id):
         user.is_active = not user.is_active
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_user_cards(user_id)
 
         action = 'activated' if user.is_active else 'deactivated'
         logger.info(f"User {user_id} {action} by admin {current_user_id}")
@@ -2095,7 +3676,7 @@ def admin_get_notes():
         search = request.args.get('search', '')
         user_id = request.args.get('user_id', type=int)
 
-        query = Note.query
+        query = Note.query.with_entities(Note.id)
 
         if search:
             query = query.filter(
@@ -2113,7 +3694,7 @@ def admin_get_notes():
         )
 
         return jsonify({
-            'notes': [note.to_dict() for note in notes.items],
+            'notes': serialize_notes([row.id for row in notes.items]),
             'total': notes.total,
             'pages': notes.pages,
             'current_page': page
@@ -2150,8 +3731,16 @@ def admin_delete_note(note_id):
             logger.error(f"Error during file cleanup for note {note_id}: {e}")
 
         # Delete from database
+        tag_change = adjust_tag_counts(note, -1) if note.is_public else None
+        adjust_user_counters(note.user_id, total_notes_count=-1, public_notes_count=-1 if note.is_public else 0)
+        stale_keys = note_surrogate_keys(note)
         db.session.delete(note)
         db.session.commit()
+        mirror_tag_counts(tag_change)
+        purge_cache(*stale_keys)
+        invalidate_note_cache(note_id)
+        invalidate_user_cards(note.user_id)
+        retract_note(note)
 
         logger.info(f"Note {note_id} deleted by admin {admin_user_id}")
         return jsonify({'message': 'Note deleted successfully'})
@@ -2164,7 +3753,7 @@ def admin_delete_note(note_id):
 @app.route('/api/admin/stats', methods=['GET'])
 @jwt_required()
 @admin_required
-@cache_result('admin_stats', 300)
+@cache_result('admin_stats', 300, stale_while_revalidate=600)
 def admin_get_stats():
     """Get platform statistics (admin only)"""
     try:
@@ -2197,6 +3786,18 @@ def admin_get_stats():
         logger.error(f"Error getting admin stats: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def notification_listing_query(model, user_id, unread_only=False, full=False):
+    """Newest-first notifications of `user_id` from Notification or NotificationArchive"""
+    # Related rows for the whole page are loaded with one IN query per relation
+    note_loader = db.selectinload(model.related_note)
+    if full:
+        note_loader = note_loader.joinedload(Note.author)
+    query = model.query.filter_by(user_id=user_id).options(note_loader, db.selectinload(model.related_user))
+
+    if unread_only:
+        query = query.filter_by(is_read=False)
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
 @app.route('/api/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
@@ -2206,22 +3807,32 @@ def get_notifications():
         page = request.args.get('page', 1, type=int)
         per_page = min(50, request.args.get('per_page', 20, type=int))
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-
-        query = Notification.query.filter_by(user_id=user_id)
-
-        if unread_only:
-            query = query.filter_by(is_read=False)
-
-        notifications = query.order_by(Notification.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        full = request.args.get('full', 'false').lower() == 'true'
+
+        archived = request.args.get('archived', 'false').lower() == 'true'
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+
+        # The archive only holds read notifications
+        sources = [NotificationArchive] if archived else [Notification]
+        if include_archived and not archived and not unread_only:
+            sources.append(NotificationArchive)
+
+        # Live notifications first, then the archive, as one continuous newest-first listing
+        offset = (max(1, page) - 1) * per_page
+        items, total = [], 0
+        for model in sources:
+            query = notification_listing_query(model, user_id, unread_only, full)
+            count = query.order_by(None).count()
+            if len(items) < per_page and offset < total + count:
+                items.extend(query.offset(max(0, offset - total)).limit(per_page - len(items)).all())
+            total += count
 
         return jsonify({
-            'notifications': [notification.to_dict() for notification in notifications.items],
-            'total': notifications.total,
-            'pages': notifications.pages,
+            'notifications': [notification.to_dict(full=full) for notification in items],
+            'total': total,
+            'pages': (total + per_page - 1) // per_page if per_page > 0 else 0,
             'current_page': page,
-            'unread_count': Notification.query.filter_by(user_id=user_id, is_read=False).count()
+            'unread_count': get_unread_count(user_id)
         })
 
     except Exception as e:
@@ -2234,10 +3845,12 @@ def mark_notification_read(notification_id):
     """Mark notification as read"""
     try:
         user_id = get_jwt_identity()
-        notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
+        Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
 
-        notification.is_read = True
+        # Conditional update so marking an already read notification doesn't decrement twice
+        marked = Notification.query.filter_by(id=notification_id, user_id=user_id, is_read=False).update({'is_read': True})
         db.session.commit()
+        adjust_unread_count(user_id, -marked)
 
         return jsonify({'message': 'Notification marked as read'})
 
@@ -2253,8 +3866,9 @@ def mark_all_notifications_read():
     try:
         user_id = get_jwt_identity()
 
-        Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
+        marked = Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
         db.session.commit()
+        adjust_unread_count(user_id, -marked)
 
         return jsonify({'message': 'All notifications marked as read'})
 
@@ -2269,14 +3883,73 @@ def get_unread_notifications_count():
     """Get count of unread notifications"""
     try:
         user_id = get_jwt_identity()
-        count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
-
-        return jsonify({'unread_count': count})
+        return jsonify({'unread_count': get_unread_count(user_id)})
 
     except Exception as e:
         logger.error(f"Error getting unread notifications count for user {user_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/notifications/stream', methods=['GET'])
+@limiter.exempt
+@jwt_required(locations=['headers', 'query_string'])
+def notification_stream():
+    """
+    Server-Sent Events stream of new notifications and unread count changes.
+    EventSource can't send headers, so the token may be passed as ?jwt=.
+    Reconnecting clients send Last-Event-ID and get the notifications they missed.
+    """
+    user_id = get_jwt_identity()
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''))
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+
+    # Subscribe before reading the backlog so nothing written in between is lost
+    subscription = notification_hub.subscribe(user_id)
+    try:
+        missed = []
+        if last_event_id is not None:
+            missed = Notification.query.options(
+                db.selectinload(Notification.related_note), db.selectinload(Notification.related_user)
+            ).filter(
+                Notification.user_id == user_id, Notification.event_seq > last_event_id
+            ).order_by(Notification.event_seq).limit(SSE_REPLAY_LIMIT).all()
+            missed = [(notification.event_seq, notification.to_dict()) for notification in missed]
+        unread_count = get_unread_count(user_id)
+    except Exception as e:
+        notification_hub.unsubscribe(user_id, subscription)
+        logger.error(f"Error opening notification stream for user {user_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    finally:
+        db.session.remove()  # Don't hold a pooled connection for the life of the stream
+
+    def generate():
+        last_sent = last_event_id or 0
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            for seq, notification in missed:
+                yield format_sse('notification', notification, seq)
+                last_sent = seq
+            yield format_sse('unread_count', {'unread_count': unread_count})
+
+            while True:
+                try:
+                    message = subscription.get(timeout=SSE_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+
+                if message['id'] is not None:
+                    if message['id'] <= last_sent:
+                        continue  # Already sent from the backlog
+                    last_sent = message['id']
+                yield format_sse(message['event'], message['data'], message['id'])
+        finally:
+            notification_hub.unsubscribe(user_id, subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/search', methods=['GET'])
 @limiter.limit("30 per minute")
 def search_notes():
@@ -2290,49 +3963,34 @@ def search_notes():
             return jsonify({'error': 'Search query or tag is required'}), 400
 
         notes_query = Note.query.filter_by(is_public=True)
+        rank_order = None
 
         if query:
-            notes_query = notes_query.filter(
-                Note.title.contains(query) |
-                Note.description.contains(query) |
-                Note.tags.contains(query)
-            )
+            notes_query, rank_order = search_index.search(notes_query, Note, query)
 
         if tag:
-            notes_query = notes_query.filter(Note.tags.contains(tag))
+            notes_query = filter_by_tag(notes_query, tag)
 
-        notes = notes_query.order_by(Note.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        notes, pagination = paginate_notes(notes_query, page, per_page, rank_order)
 
-        logger.info(f"Search performed: query='{query}', tag='{tag}', results={notes.total}")
+        logger.info(f"Search performed: query='{query}', tag='{tag}', results={len(notes)}")
         return jsonify({
-            'notes': [note.to_dict() for note in notes.items],
-            'total': notes.total,
-            'pages': notes.pages,
-            'current_page': page,
+            'notes': serialize_notes(notes),
+            **pagination,
             'search_query': query,
             'tag_filter': tag
         })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error during search: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/tags', methods=['GET'])
-@cache_result('popular_tags', 600)
+@cache_result('popular_tags', 3600, surrogate_keys=['tags'], stale_while_revalidate=600)
 def get_popular_tags():
-    notes = Note.query.filter_by(is_public=True).all()
-    tag_counts = {}
-
-    for note in notes:
-        if note.tags:
-            tags = [tag.strip() for tag in note.tags.split(',')]
-            for tag in tags:
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-
-    popular_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:20]
+    popular_tags = get_top_tags(20)
 
     return {
         'tags': [{'name': tag, 'count': count} for tag, count in popular_tags]
@@ -2430,27 +4088,23 @@ def add_comment(note_id):
         )
 
         db.session.add(comment)
-        db.session.commit()
+        note.comments_count = Note.comments_count + 1
+        db.session.flush()  # Assigns comment.id for the notifications
 
         # Create notification for note owner (if not commenting on own note)
         if note.user_id != user_id:
-            commenter = User.query.get(user_id)
             if parent_id:
-                create_notification(
+                queue_notification(
                     user_id=note.user_id,
                     notification_type='reply',
-                    title='New Reply',
-                    message=f'{commenter.username} replied to a comment on your note "{note.title}"',
                     related_note_id=note_id,
                     related_user_id=user_id,
                     related_comment_id=comment.id
                 )
             else:
-                create_notification(
+                queue_notification(
                     user_id=note.user_id,
                     notification_type='comment',
-                    title='New Comment',
-                    message=f'{commenter.username} commented on your note "{note.title}"',
                     related_note_id=note_id,
                     related_user_id=user_id,
                     related_comment_id=comment.id
@@ -2458,19 +4112,21 @@ def add_comment(note_id):
 
         # Also notify parent comment author if replying
         if parent_id:
-            parent_comment = Comment.query.get(parent_id)
-            if parent_comment and parent_comment.user_id != user_id and parent_comment.user_id != note.user_id:
-                commenter = User.query.get(user_id)
-                create_notification(
+            if parent_comment.user_id != user_id and parent_comment.user_id != note.user_id:
+                queue_notification(
                     user_id=parent_comment.user_id,
                     notification_type='reply',
-                    title='New Reply',
-                    message=f'{commenter.username} replied to your comment on "{note.title}"',
                     related_note_id=note_id,
                     related_user_id=user_id,
                     related_comment_id=comment.id
                 )
 
+        db.session.commit()
+        dispatch_notifications()
+        purge_cache(f"note:{note_id}")
+        invalidate_note_cache(note_id)
+        record_engagement('comment', note)
+
         logger.info(f"Comment added by user {user_id} on note {note_id}")
         return jsonify({
             'message': 'Comment added successfully',
@@ -2528,9 +4184,13 @@ def delete_comment(comment_id):
             return jsonify({'error': 'Access denied'}), 403
 
         # Soft delete
+        if not comment.is_deleted:
+            comment.note.comments_count = Note.comments_count - 1
         comment.is_deleted = True
         comment.content = '[Comment deleted]'
         db.session.commit()
+        purge_cache(f"note:{comment.note_id}")
+        invalidate_note_cache(comment.note_id)
 
         logger.info(f"Comment {comment_id} deleted by user {user_id}")
         return jsonify({'message': 'Comment deleted successfully'})
@@ -2543,6 +4203,7 @@ def delete_comment(comment_id):
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        search_index.create_schema()
     app.run(debug=True, host='0.0.0.0', port=5000)
 
     
\ No newline at end of file
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Script to apply the notification retention policy
+Run with: python archive_notifications.py [retention_days]
+"""
+import sys
+from app import app, db, archive_old_notifications
+
+if __name__ == '__main__':
+    retention_days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    with app.app_context():
+        db.create_all()  # Creates the notification_archive table on first run
+        moved = archive_old_notifications(retention_days)
+        print(f"Moved {moved} notifications out of the live table")
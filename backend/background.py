@@ -0,0 +1,48 @@
+"""
+Background threads started once per process
+Gunicorn imports the app and then forks its workers, and a forked worker
+inherits none of the parent's threads, so threads are started lazily on
+first use in each process rather than at import time
+"""
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProcessThread:
+    def __init__(self, target, name, on_start=None):
+        """
+        target: thread body, called with the arguments given to ensure_started
+        on_start: called before the thread starts in each process, e.g. to drop
+        state a forked worker inherited from its parent
+        """
+        self.target = target
+        self.name = name
+        self.on_start = on_start
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self, *args):
+        """Start the thread unless this process already has it"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.on_start:
+                self.on_start()
+            thread = threading.Thread(target=self.target, args=args, name=self.name, daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+def run_periodically(task, interval, description):
+    """Thread body calling `task` every `interval` seconds; failures are logged and retried next interval"""
+    while True:
+        time.sleep(interval)
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"{description} failed: {e}")
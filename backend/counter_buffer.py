@@ -0,0 +1,94 @@
+"""
+Write buffer for hot note counters (views, downloads)
+Increments go to Redis hashes, or to an in-process accumulator when Redis is
+unavailable, and are periodically drained into the database in one batch
+"""
+import uuid
+import threading
+import logging
+from collections import defaultdict
+from background import ProcessThread, run_periodically
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views_count', 'downloads_count')
+
+class CounterBuffer:
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._local = {field: defaultdict(int) for field in COUNTER_FIELDS}
+        self._lock = threading.Lock()
+        self._flusher = ProcessThread(run_periodically, 'counter-flusher')
+
+    @staticmethod
+    def _key(field):
+        return f"counters:{field}"
+
+    def incr(self, note_id, **deltas):
+        """Buffer increments for one note, e.g. incr(5, views_count=1, downloads_count=1)"""
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                for field, amount in deltas.items():
+                    pipe.hincrby(self._key(field), note_id, amount)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Counter buffer write error, buffering locally: {e}")
+
+        with self._lock:
+            for field, amount in deltas.items():
+                self._local[field][note_id] += amount
+
+    def pending(self, note_ids):
+        """Return {note_id: {field: delta}} of increments not yet flushed"""
+        result = {note_id: {field: 0 for field in COUNTER_FIELDS} for note_id in note_ids}
+        if not note_ids:
+            return result
+
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                for field in COUNTER_FIELDS:
+                    pipe.hmget(self._key(field), note_ids)
+                for field, values in zip(COUNTER_FIELDS, pipe.execute()):
+                    for note_id, value in zip(note_ids, values):
+                        result[note_id][field] += int(value or 0)
+            except Exception as e:
+                logger.warning(f"Counter buffer read error: {e}")
+
+        with self._lock:
+            for field in COUNTER_FIELDS:
+                for note_id in note_ids:
+                    result[note_id][field] += self._local[field].get(note_id, 0)
+
+        return result
+
+    def drain(self):
+        """Atomically take every buffered increment; returns {field: {note_id: delta}}"""
+        with self._lock:
+            drained = {field: dict(self._local[field]) for field in COUNTER_FIELDS}
+            for field in COUNTER_FIELDS:
+                self._local[field].clear()
+
+        if self.redis_client:
+            for field in COUNTER_FIELDS:
+                # RENAME is atomic, so increments racing with the drain land in a fresh hash
+                flushing_key = f"{self._key(field)}:flushing:{uuid.uuid4().hex}"
+                try:
+                    self.redis_client.rename(self._key(field), flushing_key)
+                except Exception:
+                    continue  # Nothing buffered for this field
+                try:
+                    for note_id, value in self.redis_client.hgetall(flushing_key).items():
+                        note_id = int(note_id)
+                        drained[field][note_id] = drained[field].get(note_id, 0) + int(value)
+                    self.redis_client.delete(flushing_key)
+                except Exception as e:
+                    logger.warning(f"Counter buffer drain error: {e}")
+
+        return drained
+
+    def ensure_flusher(self, flush, interval):
+        """Run `flush` every `interval` seconds in a background thread, once per process"""
+        self._flusher.ensure_started(flush, interval, 'Counter flush')
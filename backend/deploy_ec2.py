@@ -37,7 +37,7 @@ here's how to deploy using EC2 (which you can do manually):
 
    # For production (with gunicorn):
    pip3 install gunicorn
-   gunicorn -w 4 -b 0.0.0.0:80 app:app
+   gunicorn -k eventlet --worker-connections 1000 -w 4 -b 0.0.0.0:80 app:app
 
 ===============================================
 ALTERNATIVE: Use your existing hosting
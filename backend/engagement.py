@@ -0,0 +1,79 @@
+"""
+Append-only engagement event stream (views, downloads, likes, comments)
+Events go to a Redis stream, or to an in-process queue when Redis is
+unavailable, and are periodically compacted into rollup buckets
+"""
+import time
+import threading
+import logging
+from collections import deque
+from background import ProcessThread, run_periodically
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'engagement:events'
+STREAM_MAX_LENGTH = 1000000  # Safety cap if the compactor stops running
+
+class EngagementStream:
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._local = deque()
+        self._local_seq = 0
+        self._lock = threading.Lock()
+        self._compactor = ProcessThread(run_periodically, 'engagement-compactor')
+
+    def record(self, event_type, note_id, owner_id, delta=1):
+        """Append one event; never raises, analytics must not break the request"""
+        event = {
+            'type': event_type,
+            'note_id': note_id,
+            'owner_id': owner_id,
+            'delta': delta,
+            'ts': time.time()
+        }
+
+        if self.redis_client:
+            try:
+                self.redis_client.xadd(STREAM_KEY, event, maxlen=STREAM_MAX_LENGTH, approximate=True)
+                return
+            except Exception as e:
+                logger.warning(f"Engagement stream write error, queueing locally: {e}")
+
+        with self._lock:
+            self._local_seq += 1
+            self._local.append((f"local-{self._local_seq}", event))
+
+    def read_batch(self, count=5000):
+        """Return up to `count` of the oldest events as [(event_id, event)]"""
+        batch = []
+        if self.redis_client:
+            try:
+                for event_id, fields in self.redis_client.xrange(STREAM_KEY, count=count):
+                    batch.append((event_id, {
+                        'type': fields['type'],
+                        'note_id': int(fields['note_id']),
+                        'owner_id': int(fields['owner_id']),
+                        'delta': int(fields['delta']),
+                        'ts': float(fields['ts'])
+                    }))
+            except Exception as e:
+                logger.warning(f"Engagement stream read error: {e}")
+
+        with self._lock:
+            batch.extend(list(self._local)[:max(0, count - len(batch))])
+        return batch
+
+    def ack(self, event_ids):
+        """Remove events that have been compacted"""
+        redis_ids = [event_id for event_id in event_ids if not str(event_id).startswith('local-')]
+        local_ids = set(event_ids) - set(redis_ids)
+
+        if redis_ids:
+            self.redis_client.xdel(STREAM_KEY, *redis_ids)
+        if local_ids:
+            with self._lock:
+                self._local = deque(entry for entry in self._local if entry[0] not in local_ids)
+
+    def ensure_compactor(self, compact, interval):
+        """Run `compact` every `interval` seconds in a background thread, once per process"""
+        self._compactor.ensure_started(compact, interval, 'Engagement compaction')
@@ -0,0 +1,123 @@
+"""
+Follow graph mirrored into per-user Redis sets
+following:<id> holds who a user follows and followers:<id> who follows them.
+Sets are loaded from the follows table on first use and kept in sync by
+follow/unfollow; without Redis every lookup goes to the database
+"""
+import logging
+from redis_scripts import if_loaded
+
+logger = logging.getLogger(__name__)
+
+GRAPH_TIMEOUT = 86400  # Rebuilt from the table at least daily
+SENTINEL = 0  # Marks a loaded set, so "follows nobody" is distinguishable from "not cached"
+
+# ARGV: SADD or SREM, then the member for each key
+UPDATE_IF_LOADED_SCRIPT = if_loaded("""
+        redis.call(ARGV[1], key, ARGV[i + 1])""")
+
+class FollowGraph:
+    def __init__(self, db, follows, redis_client=None):
+        self.db = db
+        self.follows = follows
+        self.redis_client = redis_client
+
+    @staticmethod
+    def _following_key(user_id):
+        return f"following:{user_id}"
+
+    @staticmethod
+    def _followers_key(user_id):
+        return f"followers:{user_id}"
+
+    def _load(self, key, select_column, where_column, user_id):
+        if self.redis_client.exists(key):
+            return
+        ids = self.db.session.execute(
+            self.db.select(select_column).where(where_column == user_id)
+        ).scalars().all()
+        pipe = self.redis_client.pipeline()
+        pipe.delete(key)
+        pipe.sadd(key, SENTINEL, *ids)
+        pipe.expire(key, GRAPH_TIMEOUT)
+        pipe.execute()
+
+    def _load_following(self, user_id):
+        self._load(self._following_key(user_id), self.follows.c.followed_id, self.follows.c.follower_id, user_id)
+        return self._following_key(user_id)
+
+    def _load_followers(self, user_id):
+        self._load(self._followers_key(user_id), self.follows.c.follower_id, self.follows.c.followed_id, user_id)
+        return self._followers_key(user_id)
+
+    def is_following(self, follower_id, followed_id):
+        return self.following_among(follower_id, [followed_id])[followed_id]
+
+    def following_among(self, follower_id, user_ids):
+        """Return {user_id: bool} for whether `follower_id` follows each of `user_ids`"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        if self.redis_client:
+            try:
+                flags = self.redis_client.smismember(self._load_following(follower_id), user_ids)
+                return {user_id: bool(flag) for user_id, flag in zip(user_ids, flags)}
+            except Exception as e:
+                logger.warning(f"Follow graph read error, using database: {e}")
+
+        followed = set(self.db.session.execute(
+            self.db.select(self.follows.c.followed_id).where(
+                self.follows.c.follower_id == follower_id, self.follows.c.followed_id.in_(user_ids)
+            )
+        ).scalars().all())
+        return {user_id: user_id in followed for user_id in user_ids}
+
+    def followers(self, user_id):
+        """Ids of everyone following `user_id`"""
+        if self.redis_client:
+            try:
+                members = self.redis_client.smembers(self._load_followers(user_id))
+                return [int(member) for member in members if int(member) != SENTINEL]
+            except Exception as e:
+                logger.warning(f"Follow graph read error, using database: {e}")
+
+        return self.db.session.execute(
+            self.db.select(self.follows.c.follower_id).where(self.follows.c.followed_id == user_id)
+        ).scalars().all()
+
+    def follower_count(self, user_id):
+        if self.redis_client:
+            try:
+                return self.redis_client.scard(self._load_followers(user_id)) - 1
+            except Exception as e:
+                logger.warning(f"Follow graph read error, using database: {e}")
+
+        return self.db.session.execute(
+            self.db.select(self.db.func.count()).select_from(self.follows).where(self.follows.c.followed_id == user_id)
+        ).scalar()
+
+    def add(self, follower_id, followed_id):
+        """Mirror a committed follow"""
+        self._update('SADD', follower_id, followed_id)
+
+    def remove(self, follower_id, followed_id):
+        """Mirror a committed unfollow"""
+        self._update('SREM', follower_id, followed_id)
+
+    def _update(self, command, follower_id, followed_id):
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.eval(
+                UPDATE_IF_LOADED_SCRIPT, 2,
+                self._following_key(follower_id), self._followers_key(followed_id),
+                command, followed_id, follower_id
+            )
+        except Exception as e:
+            # Drop both sets so they are rebuilt rather than left stale
+            logger.warning(f"Follow graph update error: {e}")
+            try:
+                self.redis_client.delete(self._following_key(follower_id), self._followers_key(followed_id))
+            except Exception:
+                pass
@@ -0,0 +1,107 @@
+"""
+In-process LRU cache used as the first tier in front of Redis
+Entries expire by TTL and the cache is bounded by the approximate size in
+bytes of what it holds. Workers evict entries from each other's local tier
+through a Redis pub/sub channel.
+"""
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from background import ProcessThread
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+class LocalCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, default_ttl=60):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, ttl=None):
+        """Store a value whose serialized size is `size` bytes, evicting least recently used entries"""
+        if size > self.max_bytes:
+            return
+
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + ttl, value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+class InvalidationListener:
+    """Background thread evicting local cache entries published on the invalidation channel"""
+
+    def __init__(self, redis_client, cache):
+        self.redis_client = redis_client
+        self.cache = cache
+        # A forked worker inherits the parent's entries but not its listener thread
+        self._listener = ProcessThread(self._listen, 'cache-invalidation', on_start=cache.clear)
+
+    def publish(self, keys):
+        """Tell every worker (including this one) to drop `keys` from its local tier"""
+        self.cache.delete(*keys)
+        try:
+            self.redis_client.publish(INVALIDATION_CHANNEL, json.dumps(list(keys)))
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish error: {e}")
+
+    def ensure_started(self):
+        """Start the listener once per process, so forked workers each get their own"""
+        self._listener.ensure_started()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were disconnected was missed
+                self.cache.clear()
+                for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.cache.delete(*json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error, reconnecting: {e}")
+                self.cache.clear()
+                time.sleep(1)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Migration script to add denormalized likes/comments counters to the note table
+"""
+from app import app, db, reconcile_note_counters
+from sqlalchemy import text
+
+COLUMNS = ['likes_count', 'comments_count']
+
+def migrate_database():
+    """Add counter columns to note and backfill them"""
+    with app.app_context():
+        for column in COLUMNS:
+            try:
+                db.session.execute(text(f'ALTER TABLE note ADD COLUMN {column} INTEGER DEFAULT 0'))
+                db.session.commit()
+                print(f"{column} column added successfully")
+            except Exception as e:
+                db.session.rollback()
+                if 'duplicate column' in str(e).lower() or 'already exists' in str(e).lower():
+                    print(f"{column} column already exists")
+                else:
+                    print(f"Error adding column: {e}")
+                    return False
+
+        repaired = reconcile_note_counters()
+        print(f"Backfilled counters for {repaired} notes")
+        return True
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the engagement_rollup table used by creator analytics
+"""
+from app import app, db, EngagementRollup
+
+def migrate_database():
+    """Create engagement_rollup and its indexes on an existing database"""
+    with app.app_context():
+        try:
+            EngagementRollup.__table__.create(db.engine, checkfirst=True)
+            print("engagement_rollup table created successfully")
+            return True
+        except Exception as e:
+            print(f"Error creating table: {e}")
+            return False
+
+if __name__ == '__main__':
+    migrate_database()
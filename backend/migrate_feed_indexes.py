@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the composite indexes used by cursor pagination
+"""
+from app import app, db
+from sqlalchemy import text
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_note_public_feed ON note (is_public, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS ix_note_user_feed ON note (user_id, created_at, id)',
+]
+
+def migrate_database():
+    """Create the feed indexes on an existing note table"""
+    with app.app_context():
+        try:
+            for statement in INDEXES:
+                db.session.execute(text(statement))
+            db.session.commit()
+            print("Feed indexes created successfully")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating indexes: {e}")
+            return False
+
+if __name__ == '__main__':
+    migrate_database()
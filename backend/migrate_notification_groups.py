@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration script to add notification aggregation columns to the notification table
+"""
+from app import app, db
+from sqlalchemy import text
+
+COLUMNS = {
+    'group_key': 'VARCHAR(100)',
+    'actor_count': 'INTEGER DEFAULT 1',
+    'recent_actor_ids': 'JSON'
+}
+
+def migrate_database():
+    """Add aggregation columns and the group lookup index to notification"""
+    with app.app_context():
+        for column, column_type in COLUMNS.items():
+            try:
+                db.session.execute(text(f'ALTER TABLE notification ADD COLUMN {column} {column_type}'))
+                db.session.commit()
+                print(f"{column} column added successfully")
+            except Exception as e:
+                db.session.rollback()
+                if 'duplicate column' in str(e).lower() or 'already exists' in str(e).lower():
+                    print(f"{column} column already exists")
+                else:
+                    print(f"Error adding column: {e}")
+                    return False
+
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_notification_group ON notification (user_id, group_key, is_read)'
+        ))
+        db.session.commit()
+        print("ix_notification_group index created")
+        return True
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Migration script to add notification event sequence numbers
+"""
+from app import app, db
+from sqlalchemy import text
+
+COLUMNS = [
+    ('notification', 'event_seq'),
+    ('"user"', 'notification_seq')
+]
+
+def migrate_database():
+    """Add sequence columns, seed them from notification ids and index the resume lookup"""
+    with app.app_context():
+        for table, column in COLUMNS:
+            try:
+                db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER DEFAULT 0'))
+                db.session.commit()
+                print(f"{column} column added successfully")
+            except Exception as e:
+                db.session.rollback()
+                if 'duplicate column' in str(e).lower() or 'already exists' in str(e).lower():
+                    print(f"{column} column already exists")
+                else:
+                    print(f"Error adding column: {e}")
+                    return False
+
+        # Existing rows keep their ids as sequence numbers, so Last-Event-IDs clients already hold stay valid
+        db.session.execute(text('UPDATE notification SET event_seq = id WHERE event_seq IS NULL OR event_seq = 0'))
+        db.session.execute(text(
+            'UPDATE "user" SET notification_seq = '
+            '(SELECT COALESCE(MAX(event_seq), 0) FROM notification WHERE notification.user_id = "user".id)'
+        ))
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_notification_user_seq ON notification (user_id, event_seq)'
+        ))
+        db.session.commit()
+        print("Notification sequences backfilled")
+        return True
+
+if __name__ == '__main__':
+    migrate_database()
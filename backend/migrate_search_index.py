@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the full-text search index for notes
+(SQLite FTS5 table and triggers, or Postgres tsvector column and GIN index)
+"""
+from app import app, db, search_index
+
+def migrate_database():
+    """Create the search index and populate it from existing notes"""
+    with app.app_context():
+        try:
+            if search_index.create_schema():
+                print("Search index created successfully")
+            else:
+                print("Full-text search not supported on this database, LIKE search will be used")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating search index: {e}")
+            return False
+
+if __name__ == '__main__':
+    migrate_database()
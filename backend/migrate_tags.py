@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the tag tables and backfill them from Note.tags
+"""
+from app import app, db, Note, Tag, set_note_tags
+
+BATCH_SIZE = 500
+
+def migrate_database():
+    """Create tag/note_tags tables and normalize existing tag strings"""
+    with app.app_context():
+        try:
+            db.create_all()
+            print("Tag tables created successfully")
+
+            migrated = 0
+            last_id = 0
+            while True:
+                notes = Note.query.filter(Note.id > last_id).order_by(Note.id).limit(BATCH_SIZE).all()
+                if not notes:
+                    break
+
+                for note in notes:
+                    set_note_tags(note, note.tags)
+                db.session.commit()
+
+                migrated += len(notes)
+                last_id = notes[-1].id
+                print(f"Backfilled tags for {migrated} notes")
+
+            print(f"Tag migration completed, {Tag.query.count()} distinct tags")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error migrating tags: {e}")
+            return False
+
+if __name__ == '__main__':
+    migrate_database()
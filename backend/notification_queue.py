@@ -0,0 +1,59 @@
+"""
+In-process notification dispatch queue
+Request handlers submit lightweight notification events; a background
+thread coalesces them over a short window, drops duplicates, groups them
+by recipient and hands each batch to a delivery callback
+"""
+import time
+import queue
+import logging
+from background import ProcessThread
+
+logger = logging.getLogger(__name__)
+
+EVENT_KEY_FIELDS = ('user_id', 'type', 'related_note_id', 'related_user_id', 'related_comment_id')
+
+class NotificationDispatcher:
+    def __init__(self, deliver, batch_window=1.0, max_batch=500):
+        self.deliver = deliver
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = ProcessThread(self._run, 'notification-dispatcher')
+
+    def submit(self, events):
+        """Queue events for delivery and return immediately"""
+        self._worker.ensure_started()
+        for event in events:
+            self._queue.put(event)
+
+    @staticmethod
+    def dedupe(events):
+        """Drop repeated events and order the rest by recipient, keeping arrival order per recipient"""
+        seen = set()
+        by_recipient = {}
+        for event in events:
+            key = tuple(event.get(field) for field in EVENT_KEY_FIELDS)
+            if key in seen:
+                continue
+            seen.add(key)
+            by_recipient.setdefault(event['user_id'], []).append(event)
+        return [event for recipient_events in by_recipient.values() for event in recipient_events]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self.deliver(self.dedupe(batch))
+            except Exception as e:
+                logger.error(f"Notification delivery failed for {len(batch)} events: {e}")
@@ -0,0 +1,81 @@
+"""
+Fan-out of live notification events to Server-Sent Events connections
+Each worker holds one Redis pub/sub subscription and routes messages to the
+in-process queues of the users connected to it, so idle connections cost a
+queue each rather than a Redis connection each
+"""
+import json
+import time
+import queue
+import threading
+import logging
+from background import ProcessThread
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_CHANNEL = 'notifications:events'
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class NotificationHub:
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._subscribers = {}  # user_id -> set of queues
+        self._lock = threading.Lock()
+        # A forked worker inherits the parent's registry but none of its connections
+        self._listener = ProcessThread(self._listen, 'notification-hub', on_start=self._clear_subscribers)
+
+    def publish(self, user_id, event, data, event_id=None):
+        """Send an event to every connection `user_id` has open, on any worker"""
+        message = {'user_id': user_id, 'event': event, 'data': data, 'id': event_id}
+        if self.redis_client:
+            try:
+                self.redis_client.publish(NOTIFICATION_CHANNEL, json.dumps(message, default=str))
+                return
+            except Exception as e:
+                logger.warning(f"Notification publish error, delivering locally only: {e}")
+        self._deliver(message)
+
+    def subscribe(self, user_id):
+        """Register a connection; returns the queue its events arrive on"""
+        self._ensure_started()
+        subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[user_id]
+
+    def _deliver(self, message):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(message['user_id'], ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                pass  # Client isn't reading; it resyncs from Last-Event-ID when it reconnects
+
+    def _ensure_started(self):
+        if self.redis_client:
+            self._listener.ensure_started()
+
+    def _clear_subscribers(self):
+        with self._lock:
+            self._subscribers = {}
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(NOTIFICATION_CHANNEL)
+                for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self._deliver(json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Notification hub listener error, reconnecting: {e}")
+                time.sleep(1)
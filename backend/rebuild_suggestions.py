@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Script to recompute follow suggestions (requires numpy and scipy)
+Run with: python rebuild_suggestions.py
+"""
+from app import app, db, rebuild_follow_suggestions
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()  # Creates the user_suggestion table on first run
+        users = rebuild_follow_suggestions()
+        print(f"Rebuilt follow suggestions for {users} users")
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Script to recompute tag usage counts and the popular tags leaderboard
+Run with: python rebuild_tag_counts.py
+"""
+from app import app, db, rebuild_tag_counts
+from sqlalchemy import text
+
+def add_count_column():
+    """Add public_notes_count to databases created before it existed"""
+    try:
+        db.session.execute(text('ALTER TABLE tag ADD COLUMN public_notes_count INTEGER DEFAULT 0'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_tag_public_notes_count ON tag (public_notes_count)'))
+        db.session.commit()
+        print("public_notes_count column added successfully")
+    except Exception as e:
+        db.session.rollback()
+        if 'duplicate column' not in str(e).lower() and 'already exists' not in str(e).lower():
+            raise
+
+if __name__ == '__main__':
+    with app.app_context():
+        add_count_column()
+        tags = rebuild_tag_counts()
+        print(f"Rebuilt counts for {tags} tags")
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Script to repair drift in the denormalized note and profile counters and
+the cached unread notification counters
+Run with: python reconcile_counters.py
+"""
+from app import app, reconcile_note_counters, reconcile_user_counters, reconcile_unread_counts
+
+if __name__ == '__main__':
+    with app.app_context():
+        repaired = reconcile_note_counters()
+        print(f"Repaired counters on {repaired} notes")
+        repaired = reconcile_user_counters()
+        print(f"Repaired profile counters on {repaired} users")
+        repaired = reconcile_unread_counts()
+        print(f"Repaired {repaired} unread notification counters")
@@ -3,7 +3,7 @@
 Script to recreate the database with all new columns
 """
 import os
-from app import app, db
+from app import app, db, search_index
 
 def recreate_database():
     """Recreate the database with all tables"""
@@ -16,6 +16,7 @@ def recreate_database():
     # Create all tables with current schema
     with app.app_context():
         db.create_all()
+        search_index.create_schema()
         print("Database recreated successfully!")
         print("Tables created:")
 
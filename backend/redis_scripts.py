@@ -0,0 +1,24 @@
+"""
+Lua scripts for Redis mirrors of database state
+Leaderboards, follow sets, timelines and counters are loaded from their
+tables on first read. Writers must only update a mirror that is already
+loaded: creating a missing one would leave it holding just this change,
+and it would be served as if complete until it expired.
+"""
+
+def if_loaded(body):
+    """
+    Lua script running `body` for each of KEYS that exists, skipping missing
+    ones, which are rebuilt from the table on next read. In `body`, `key` is
+    the current key and `i` its 1-based position; assign `result` to return
+    a value (the last one assigned, or nil).
+    """
+    return f"""
+local result = nil
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+{body}
+    end
+end
+return result
+"""
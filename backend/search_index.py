@@ -0,0 +1,124 @@
+"""
+Full-text search index for notes
+Uses SQLite FTS5 or a Postgres tsvector/GIN index depending on the database,
+and falls back to LIKE filtering when neither index has been created
+"""
+import re
+import logging
+from sqlalchemy import text, inspect
+
+logger = logging.getLogger(__name__)
+
+# The index is kept in sync by the database itself (triggers on SQLite, a
+# generated column on Postgres), so inserts, edits and deletes through any
+# code path update it in the same transaction.
+SQLITE_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+        title, description, tags,
+        content='note', content_rowid='id', tokenize='porter unicode61'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF title, description, tags ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+        INSERT INTO note_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END''',
+]
+
+POSTGRES_SCHEMA = [
+    '''ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(tags, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED''',
+    'CREATE INDEX IF NOT EXISTS ix_note_search_vector ON note USING GIN (search_vector)',
+]
+
+class SearchIndex:
+    def __init__(self, db):
+        self.db = db
+        self._available = None
+
+    @property
+    def dialect(self):
+        return self.db.engine.dialect.name
+
+    def create_schema(self):
+        """Create the index for the current database and populate it from existing notes"""
+        if self.dialect == 'sqlite':
+            statements = SQLITE_SCHEMA + ["INSERT INTO note_fts(note_fts) VALUES ('rebuild')"]
+        elif self.dialect == 'postgresql':
+            statements = POSTGRES_SCHEMA
+        else:
+            logger.warning(f"Full-text search not supported on {self.dialect}, using LIKE search")
+            return False
+
+        for statement in statements:
+            self.db.session.execute(text(statement))
+        self.db.session.commit()
+        self._available = True
+        logger.info(f"Full-text search index created for {self.dialect}")
+        return True
+
+    def is_available(self):
+        """Check once per process whether the index exists"""
+        if self._available is None:
+            try:
+                inspector = inspect(self.db.engine)
+                if self.dialect == 'sqlite':
+                    self._available = inspector.has_table('note_fts')
+                elif self.dialect == 'postgresql':
+                    columns = [column['name'] for column in inspector.get_columns('note')]
+                    self._available = 'search_vector' in columns
+                else:
+                    self._available = False
+            except Exception as e:
+                logger.warning(f"Could not inspect search index: {e}")
+                self._available = False
+
+            if not self._available:
+                logger.warning("Full-text search index missing, run migrate_search_index.py")
+        return self._available
+
+    @staticmethod
+    def _terms(search):
+        """Split a search string into word tokens safe to embed in an FTS query"""
+        return re.findall(r'\w+', search.lower())
+
+    def search(self, query, model, search):
+        """
+        Restrict a query on `model` to rows matching `search`.
+        Returns: (filtered_query, rank_order) where rank_order sorts best matches
+        first, or is None when falling back to unranked LIKE filtering
+        """
+        terms = self._terms(search)
+        if not terms:
+            return query.filter(text('1 = 0')), None
+
+        if not self.is_available():
+            like_filter = model.title.contains(search) | model.description.contains(search) | model.tags.contains(search)
+            return query.filter(like_filter), None
+
+        if self.dialect == 'sqlite':
+            # Prefix match every term; bm25 weights title over tags over description
+            match = ' '.join(f'"{term}"*' for term in terms)
+            fts = text(
+                'SELECT rowid AS note_id, bm25(note_fts, 10.0, 2.0, 5.0) AS rank '
+                'FROM note_fts WHERE note_fts MATCH :match'
+            ).bindparams(match=match).columns(
+                note_id=self.db.Integer, rank=self.db.Float
+            ).subquery('fts')
+            return query.join(fts, model.id == fts.c.note_id), fts.c.rank.asc()
+
+        tsquery = self.db.func.to_tsquery('english', ' & '.join(f'{term}:*' for term in terms))
+        vector = self.db.literal_column('note.search_vector')
+        return query.filter(vector.op('@@')(tsquery)), self.db.func.ts_rank_cd(vector, tsquery).desc()
@@ -0,0 +1,66 @@
+"""
+Offline "who to follow" suggestions
+Candidates are friends of friends (accounts followed by accounts a user
+follows), scored by that overlap plus the cosine similarity of the two
+users' public note tags. Tag similarity is only computed for those
+candidate pairs, never user-by-user, so memory stays proportional to the
+friends-of-friends graph and each row chunk is bounded
+"""
+import logging
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+def _matrix(rows, cols, values, shape):
+    return sparse.csr_matrix((np.asarray(values, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))), shape=shape)
+
+def compute_suggestions(user_ids, follow_edges, user_tag_counts, top_k=20, tag_weight=2.0, chunk_size=1000):
+    """
+    user_ids: every account that can receive or be a suggestion
+    follow_edges: iterable of (follower_id, followed_id)
+    user_tag_counts: iterable of (user_id, tag_id, public notes with that tag)
+    Yields: (user_id, [(suggested_user_id, score, mutual_count)]) best first,
+    excluding the user and accounts they already follow
+    """
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+    n = len(user_ids)
+    if n == 0:
+        return
+
+    edges = [(index[a], index[b]) for a, b in follow_edges if a in index and b in index]
+    follows = _matrix([a for a, _ in edges], [b for _, b in edges], np.ones(len(edges)), (n, n))
+
+    tag_rows = [(index[u], t, c) for u, t, c in user_tag_counts if u in index]
+    tag_ids = {t: i for i, t in enumerate(sorted({t for _, t, _ in tag_rows}))}
+    tags = _matrix([u for u, _, _ in tag_rows], [tag_ids[t] for _, t, _ in tag_rows], [c for _, _, c in tag_rows], (n, max(1, len(tag_ids))))
+    # L2-normalize rows so tags @ tags.T is cosine similarity
+    norms = np.sqrt(np.asarray(tags.multiply(tags).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    tags = (sparse.diags(1.0 / norms) @ tags).tocsr()
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        mutual = (follows[start:stop] @ follows).tocsr()
+        mutual.sort_indices()
+        # Row-wise tag dot products for just the (user, candidate) pairs in mutual
+        pair_rows = np.repeat(np.arange(stop - start), np.diff(mutual.indptr))
+        similarity = np.asarray(tags[start + pair_rows].multiply(tags[mutual.indices]).sum(axis=1)).ravel()
+        scores = sparse.csr_matrix((mutual.data + tag_weight * similarity, mutual.indices, mutual.indptr), shape=mutual.shape)
+
+        # Drop the user themselves and accounts they already follow
+        exclude = follows[start:stop] + sparse.csr_matrix((np.ones(stop - start), (np.arange(stop - start), np.arange(start, stop))), shape=(stop - start, n))
+        scores = scores - scores.multiply(exclude > 0)
+        scores.eliminate_zeros()
+
+        for row in range(stop - start):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            if begin == end:
+                continue
+            columns = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            best = np.argsort(-values, kind='stable')[:top_k]
+            yield user_ids[start + row], [
+                (user_ids[columns[i]], float(values[i]), int(mutual[row, columns[i]]))
+                for i in best
+            ]
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 import os
 from PIL import Image
 import logging
@@ -8,6 +9,12 @@ logger = logging.getLogger(__name__)
 celery_app = Celery('notes_app')
 celery_app.conf.broker_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 celery_app.conf.result_backend = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+celery_app.conf.timezone = 'UTC'
+
+# Run by `celery -A tasks beat`; each periodic task adds its entry below its
+# definition. View/download counters and engagement events are drained by
+# threads inside the web workers instead
+celery_app.conf.beat_schedule = {}
 
 @celery_app.task
 def process_image_thumbnails(file_path, filename, upload_folder):
@@ -82,4 +89,125 @@ def cleanup_old_files(file_paths):
             logger.error(f"Error cleaning up file {file_path}: {e}")
 
     logger.info(f"Cleaned up {cleaned} files")
-    return cleaned
\ No newline at end of file
+    return cleaned
+
+@celery_app.task
+def reconcile_engagement_counters():
+    """
+    Periodic task to repair drift in Note.likes_count / Note.comments_count
+    """
+    try:
+        from app import app, reconcile_note_counters
+        with app.app_context():
+            return reconcile_note_counters()
+    except Exception as e:
+        logger.error(f"Error reconciling engagement counters: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['reconcile-engagement-counters'] = {
+    'task': 'tasks.reconcile_engagement_counters',
+    'schedule': crontab(minute=0)  # Hourly
+}
+
+@celery_app.task
+def rebuild_popular_tags():
+    """
+    Periodic task to recompute tag counts and the popular tags leaderboard
+    """
+    try:
+        from app import app, rebuild_tag_counts
+        with app.app_context():
+            return rebuild_tag_counts()
+    except Exception as e:
+        logger.error(f"Error rebuilding popular tags: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['rebuild-popular-tags'] = {
+    'task': 'tasks.rebuild_popular_tags',
+    'schedule': crontab(minute=10)  # Hourly
+}
+
+@celery_app.task
+def deliver_notifications(events):
+    """
+    Background task to render and write a batch of notification events
+    """
+    try:
+        from app import app, deliver_notifications as deliver
+        with app.app_context():
+            return deliver(events)
+    except Exception as e:
+        logger.error(f"Error delivering {len(events)} notifications: {e}")
+        return 0
+
+@celery_app.task
+def reconcile_unread_notification_counts():
+    """
+    Periodic task to repair drift in the cached unread notification counters
+    """
+    try:
+        from app import app, reconcile_unread_counts
+        with app.app_context():
+            return reconcile_unread_counts()
+    except Exception as e:
+        logger.error(f"Error reconciling unread notification counts: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['reconcile-unread-notification-counts'] = {
+    'task': 'tasks.reconcile_unread_notification_counts',
+    'schedule': crontab(minute=40)  # Hourly
+}
+
+@celery_app.task
+def archive_old_notifications():
+    """
+    Periodic task to move old read notifications out of the live table
+    """
+    try:
+        from app import app, archive_old_notifications as archive
+        with app.app_context():
+            return archive()
+    except Exception as e:
+        logger.error(f"Error archiving notifications: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['archive-old-notifications'] = {
+    'task': 'tasks.archive_old_notifications',
+    'schedule': crontab(minute=20)  # Hourly
+}
+
+@celery_app.task
+def rebuild_follow_suggestions():
+    """
+    Nightly task to recompute the precomputed follow suggestions
+    """
+    try:
+        from app import app, rebuild_follow_suggestions as rebuild
+        with app.app_context():
+            return rebuild()
+    except Exception as e:
+        logger.error(f"Error rebuilding follow suggestions: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['rebuild-follow-suggestions'] = {
+    'task': 'tasks.rebuild_follow_suggestions',
+    'schedule': crontab(hour=3, minute=0)  # Nightly
+}
+
+@celery_app.task
+def reconcile_user_counters():
+    """
+    Periodic task to repair drift in the User profile counters
+    """
+    try:
+        from app import app, reconcile_user_counters as reconcile
+        with app.app_context():
+            return reconcile()
+    except Exception as e:
+        logger.error(f"Error reconciling user counters: {e}")
+        return 0
+
+celery_app.conf.beat_schedule['reconcile-user-counters'] = {
+    'task': 'tasks.reconcile_user_counters',
+    'schedule': crontab(minute=30)  # Hourly
+}
@@ -0,0 +1,63 @@
+"""
+Shared test setup: the app is imported against a throwaway SQLite database
+and upload folder, with Redis pointed at a closed port so nothing is cached
+between requests. Run from backend/: python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix='notes-app-tests-')
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORK_DIR, 'uploads')
+os.environ['REDIS_URL'] = 'redis://localhost:1/0'
+sys.path.insert(0, BACKEND_DIR)
+
+import app as backend  # noqa: E402
+
+NOTE_COUNT = 60
+
+
+@pytest.fixture(scope='session')
+def client():
+    """Test client over NOTE_COUNT public notes, each by a different author"""
+    app = backend.app
+    app.config['TESTING'] = True
+    backend.limiter.enabled = False
+
+    with app.app_context():
+        backend.db.create_all()
+        # One author per note, so lazily loading authors would show up as extra statements
+        users = [backend.User(username=f'user{i}', email=f'user{i}@example.com') for i in range(NOTE_COUNT)]
+        backend.db.session.add_all(users)
+        backend.db.session.commit()
+
+        for i, author in enumerate(users):
+            note = backend.Note(
+                title=f'Note {i}', filename=f'note{i}.txt', original_filename=f'note{i}.txt',
+                is_public=True, user_id=author.id
+            )
+            backend.db.session.add(note)
+            backend.db.session.flush()
+            backend.set_note_tags(note, f'tag{i % 7}, shared')
+            for liker in users[:i % 4]:
+                backend.db.session.add(backend.Like(user_id=liker.id, note_id=note.id))
+            backend.db.session.add(backend.Comment(content='Nice', user_id=users[0].id, note_id=note.id))
+        backend.db.session.commit()
+        backend.reconcile_note_counters()
+
+    # Requests run in their own app contexts, so nothing loaded above is reused from the identity map
+    yield app.test_client()
+
+    with app.app_context():
+        backend.db.drop_all()
+        backend.db.engine.dispose()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,37 @@
+"""
+Date range parsing for /api/my-notes/analytics
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as backend
+
+
+@pytest.fixture
+def headers(client):
+    with backend.app.app_context():
+        user_id = backend.db.session.query(backend.User.id).order_by(backend.User.id).limit(1).scalar()
+        token = create_access_token(identity=str(user_id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.mark.parametrize('query', [
+    'start=2026-01-01T00:00:00Z',
+    'start=2026-01-01T00:00:00%2B02:00&end=2026-01-10T00:00:00',
+    'start=2026-01-01&end=2026-01-10T00:00:00Z',
+])
+def test_offset_and_naive_bounds_can_be_mixed(client, headers, query):
+    response = client.get(f'/api/my-notes/analytics?granularity=day&{query}', headers=headers)
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('query', [
+    'start=yesterday',
+    'end=2026-13-01',
+    'end=0001-01-01T00:00:00',
+])
+def test_malformed_bounds_are_rejected(client, headers, query):
+    response = client.get(f'/api/my-notes/analytics?granularity=day&{query}', headers=headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,28 @@
+"""
+Input validation for POST /api/users/follow-status
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as backend
+
+
+@pytest.fixture
+def headers(client):
+    with backend.app.app_context():
+        token = create_access_token(identity='1')
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.mark.parametrize('user_ids', [[True, 2], [1, '2'], [1.0], 'not-a-list', list(range(101))])
+def test_invalid_user_ids_are_rejected(client, headers, user_ids):
+    response = client.post('/api/users/follow-status', json={'user_ids': user_ids}, headers=headers)
+
+    assert response.status_code == 400
+
+
+def test_follow_status_lists_each_requested_user(client, headers):
+    response = client.post('/api/users/follow-status', json={'user_ids': [1, 2, 3]}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['following'] == {'1': False, '2': False, '3': False}
@@ -0,0 +1,30 @@
+"""
+Cursor pagination edge cases
+"""
+import pytest
+
+from conftest import NOTE_COUNT
+
+
+@pytest.mark.parametrize('per_page', [0, -5])
+def test_cursor_page_size_is_clamped_to_at_least_one(client, per_page):
+    response = client.get(f'/api/notes?cursor=&per_page={per_page}')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['notes']) == 1
+    assert data['per_page'] == 1
+    assert data['has_more'] is True
+    assert data['next_cursor']
+
+
+def test_cursor_pages_walk_every_note_once(client):
+    seen, cursor = [], ''
+    while True:
+        data = client.get(f'/api/notes?cursor={cursor}&per_page=25').get_json()
+        seen.extend(note['id'] for note in data['notes'])
+        if not data['has_more']:
+            break
+        cursor = data['next_cursor']
+
+    assert len(seen) == len(set(seen)) == NOTE_COUNT
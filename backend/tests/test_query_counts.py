@@ -0,0 +1,42 @@
+"""
+The public note listing must issue the same number of SQL statements
+whatever the page size, i.e. no per-note (N+1) queries
+"""
+from sqlalchemy import event
+
+import app as backend
+
+PAGE_SIZES = (5, 12, 50)
+
+
+def count_statements(client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with backend.app.app_context():
+        engine = backend.db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements), len(response.get_json()['notes'])
+
+
+def test_note_listing_query_count_is_independent_of_page_size(client):
+    results = {per_page: count_statements(client, f'/api/notes?per_page={per_page}') for per_page in PAGE_SIZES}
+
+    assert [returned for _, returned in results.values()] == list(PAGE_SIZES)
+    counts = {per_page: statements for per_page, (statements, _) in results.items()}
+    assert len(set(counts.values())) == 1, f"Statement count varies with page size: {counts}"
+
+
+def test_cursor_listing_query_count_is_independent_of_page_size(client):
+    results = {per_page: count_statements(client, f'/api/notes?cursor=&per_page={per_page}') for per_page in PAGE_SIZES}
+
+    counts = {per_page: statements for per_page, (statements, _) in results.items()}
+    assert len(set(counts.values())) == 1, f"Statement count varies with page size: {counts}"
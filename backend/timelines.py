@@ -0,0 +1,99 @@
+"""
+Per-user "people I follow" timelines for fan-out-on-write feeds
+timeline:<id> is a sorted set of note ids scored by creation time, capped at
+a fixed length. Timelines are built from the database on first read, new
+public notes are pushed into the already-built timelines of the author's
+followers, and accounts with too many followers to push to are recorded so
+readers merge their notes in at read time instead
+"""
+import logging
+from datetime import datetime
+from redis_scripts import if_loaded
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_TIMEOUT = 7 * 86400  # Timelines of inactive readers expire and are rebuilt on return
+PULL_ACCOUNTS_KEY = 'timeline:pull_accounts'
+SENTINEL = 'built'  # Scored 0, marks a built timeline so an empty one is still cached
+EPOCH = datetime(1970, 1, 1)
+PUSH_BATCH_SIZE = 500
+
+# ARGV: score, note id, max length; rank 0 is the sentinel, so trimming starts at rank 1
+PUSH_IF_BUILT_SCRIPT = if_loaded("""
+        redis.call('ZADD', key, ARGV[1], ARGV[2])
+        redis.call('ZREMRANGEBYRANK', key, 1, -(tonumber(ARGV[3]) + 1))""")
+
+def timeline_score(created_at):
+    """Sort score of a note in a timeline (UTC seconds since the epoch)"""
+    return (created_at - EPOCH).total_seconds()
+
+class TimelineStore:
+    def __init__(self, redis_client=None, max_length=800):
+        self.redis_client = redis_client
+        self.max_length = max_length
+
+    @property
+    def available(self):
+        return self.redis_client is not None
+
+    @staticmethod
+    def _key(user_id):
+        return f"timeline:{user_id}"
+
+    def build(self, user_id, entries):
+        """Replace a timeline with `entries` [(score, note_id)]"""
+        key = self._key(user_id)
+        mapping = {SENTINEL: 0}
+        mapping.update({str(note_id): score for score, note_id in entries[:self.max_length]})
+        pipe = self.redis_client.pipeline()
+        pipe.delete(key)
+        pipe.zadd(key, mapping)
+        pipe.expire(key, TIMELINE_TIMEOUT)
+        pipe.execute()
+
+    def page(self, user_id, before=None, count=20):
+        """
+        Newest entries older than `before` (a (score, note_id) position), as
+        [(score, note_id)]. Returns None if the timeline hasn't been built.
+        """
+        key = self._key(user_id)
+        max_score = before[0] if before else '+inf'
+        # Fetch extra to step over entries sharing the cursor's score
+        rows = self.redis_client.zrevrangebyscore(key, max_score, '(0', start=0, num=count + 10, withscores=True)
+        if not rows and not self.redis_client.exists(key):
+            return None
+
+        entries = [(score, int(member)) for member, score in rows]
+        if before:
+            entries = [entry for entry in entries if entry < tuple(before)]
+        return entries[:count]
+
+    def push(self, follower_ids, note_id, score):
+        """Add a note to the built timelines of `follower_ids`"""
+        follower_ids = list(follower_ids)
+        for start in range(0, len(follower_ids), PUSH_BATCH_SIZE):
+            keys = [self._key(follower_id) for follower_id in follower_ids[start:start + PUSH_BATCH_SIZE]]
+            self.redis_client.eval(PUSH_IF_BUILT_SCRIPT, len(keys), *keys, score, note_id, self.max_length)
+
+    def retract(self, follower_ids, note_id):
+        """Remove a deleted or now-private note from the timelines of `follower_ids`"""
+        follower_ids = list(follower_ids)
+        for start in range(0, len(follower_ids), PUSH_BATCH_SIZE):
+            pipe = self.redis_client.pipeline()
+            for follower_id in follower_ids[start:start + PUSH_BATCH_SIZE]:
+                pipe.zrem(self._key(follower_id), note_id)
+            pipe.execute()
+
+    def invalidate(self, user_id):
+        """Drop a timeline so it is rebuilt, e.g. after its owner follows or unfollows someone"""
+        self.redis_client.delete(self._key(user_id))
+
+    def mark_pull_account(self, user_id):
+        self.redis_client.sadd(PULL_ACCOUNTS_KEY, user_id)
+
+    def is_pull_account(self, user_id):
+        return bool(self.redis_client.sismember(PULL_ACCOUNTS_KEY, user_id))
+
+    def pull_accounts(self):
+        """Accounts whose notes are merged in at read time rather than pushed"""
+        return [int(user_id) for user_id in self.redis_client.smembers(PULL_ACCOUNTS_KEY)]